@@ -0,0 +1,84 @@
+# Local JSON API for managing the wifi service without the Tk window
+import traceback
+from flask import Flask, jsonify, request
+from waitress import serve
+
+ADMIN_HOST = "127.0.0.1" # only reachable from the machine running the service
+ADMIN_PORT = 8080
+ADMIN_THREADS = 2
+
+class AdminApi:
+
+    def __init__(self, service, host=ADMIN_HOST, port=ADMIN_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.app = Flask(__name__)
+
+        @self.app.route('/api/status', methods=['GET'])
+        def status():
+            return jsonify(self.service.get_status())
+
+        @self.app.route('/api/codes', methods=['GET'])
+        def get_codes():
+            rows = self.service.get_code_rows()
+            return jsonify([{"code": code, "status": status, "users": users, "time_left": time_left} for code, status, users, time_left in rows])
+
+        @self.app.route('/api/codes', methods=['POST'])
+        def create_code():
+            body = request.get_json(silent=True) or {}
+            try:
+                duration = float(body.get("duration", 60))
+            except (TypeError, ValueError):
+                return jsonify({"error": "duration must be a number"}), 400
+            code = self.service.generate_code(duration)
+            if code is None:
+                return jsonify({"error": "Could not add code"}), 500
+            return jsonify({"code": code}), 201
+
+        @self.app.route('/api/codes/<code>', methods=['DELETE'])
+        def delete_code(code):
+            self.service.delete_code(code)
+            return jsonify({"deleted": code})
+
+        @self.app.route('/api/vouchers', methods=['POST'])
+        def create_vouchers():
+            body = request.get_json(silent=True) or {}
+            try:
+                count = int(body["count"])
+                duration = float(body.get("duration", 60))
+            except (KeyError, TypeError, ValueError):
+                return jsonify({"error": "count and duration must be numbers"}), 400
+            try:
+                csv_path, sheet_path = self.service.generate_vouchers(count, duration)
+            except Exception as e:
+                print(f"Error in create_vouchers: {e}")
+                traceback.print_exc()
+                return jsonify({"error": str(e)}), 500
+            return jsonify({"csv": csv_path, "sheet": sheet_path}), 201
+
+        # The destructive operations need the same confirmation word the Tk dialogs ask for
+        @self.app.route('/api/unblock', methods=['POST'])
+        def unblock_all():
+            body = request.get_json(silent=True) or {}
+            if body.get("confirm") != "unblock":
+                return jsonify({"error": "send {\"confirm\": \"unblock\"} to unblock all devices"}), 400
+            try:
+                unblocked = self.service.unblock_all()
+            except Exception as e:
+                print(f"Error in unblock_all: {e}")
+                traceback.print_exc()
+                return jsonify({"error": str(e)}), 500
+            return jsonify({"unblocked": unblocked})
+
+        @self.app.route('/api/reset', methods=['POST'])
+        def reset_database():
+            body = request.get_json(silent=True) or {}
+            if body.get("confirm") != "reset":
+                return jsonify({"error": "send {\"confirm\": \"reset\"} to delete all codes"}), 400
+            self.service.reset_database()
+            return jsonify({"reset": True})
+
+    def run(self):
+        print(f"Admin API listening on http://{self.host}:{self.port}")
+        serve(self.app, host=self.host, port=self.port, threads=ADMIN_THREADS)
@@ -1,14 +1,9 @@
 from collections import deque
-import sched
 import threading
-import time
 import traceback
-from external.webserver import WebServer
-from router_device import Router
-from code_manager import CodeManager
-from queue import Queue
-from concurrent.futures import ThreadPoolExecutor
+from snapshot_channel import SnapshotChannel
 from rows_ui import Rows
+from wifi_service import WifiService, MAX_VOUCHER_BATCH
 import signal
 import sys
 
@@ -19,28 +14,24 @@ import customtkinter
 customtkinter.set_appearance_mode("Dark")  # Modes: "System" (standard), "Dark", "Light"
 customtkinter.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
 
-NUM_WORKERS = 2  # number of workers to use for the thread pool
-task_queue = Queue()
-update_queue = Queue()
-UNBLOCK_SCHEDULE = 75 # 1 hour and 15 minutes
-TICK_INTERVAL = 60  # 1 minute
 APP_WIDTH = 900
 APP_HEIGHT = 580
 APP_SCALING = "110%"
 APP_NAME = "Wifi Manager"
+UI_PUMP_INTERVAL = 100 # milliseconds between code table renders on the Tk main loop
 
 class App(customtkinter.CTk):
     def __init__(self):
         super().__init__()
-        self.ui_lock = threading.RLock()
-        self.manager_lock = threading.RLock()
-        self.router_lock = threading.RLock()
+        # the router and the database get ready while the window is built
+        self.service = WifiService()
+        self.service.start()
+        self.row_channel = SnapshotChannel() # newest rows for the Tk main loop
         self.running = True
 
         self.unblock_button_disabled = False
         self.resetdb_button_disabled = False
 
-        self.minute_counter = 0
         # configure window
         self.title(APP_NAME)
         self.geometry(f"{APP_WIDTH}x{APP_HEIGHT}")
@@ -69,10 +60,15 @@ class App(customtkinter.CTk):
         self.newcode.grid(row=3, column=0, padx=20, pady=5)
         self.newcode.configure(text="", state="disabled")
 
+        # create generate vouchers Button
+        self.vouchers_button = customtkinter.CTkButton(self.left_frame, command=self.generate_vouchers_event)
+        self.vouchers_button.grid(row=4, column=0, padx=20, pady=(20, 5), sticky="n")
+        self.vouchers_button.configure(text="Generate Vouchers")
+
         # create unblock devices Button
         self.unblock_button = customtkinter.CTkButton(self.left_frame, command=self.temporary_unblock_event)
         self.unblock_button.grid(row=5, column=0, padx=20, pady=20)
-        self.unblock_button.configure(text="Unblock Devices")
+        self.unblock_button.configure(text="Unblock Devices", state="disabled") # enabled once the router is logged in
 
         # create database reset Button
         self.reset_database_button = customtkinter.CTkButton(self.left_frame, command=self.reset_db_button_event)
@@ -101,40 +97,22 @@ class App(customtkinter.CTk):
         
         
         ### Main Objects Setup ###
-        self.manager = CodeManager(self.on_code_expired)
-        self.router = Router()
-        self.router.login()
-    
-        self.webserver = WebServer(on_success_callback=task_queue.put)
-        self.webserver_thread = threading.Thread(target=self.webserver.run)
-        self.webserver_thread.start()
         self.rows = Rows(self.inner_frame, self.label_width, self.delete_row_buton_event)
 
-        time.sleep(5)
-        self.setup_environment()
-        print("Setup done")
-
         self.update_thread = threading.Thread(target=self.update_queue)
         self.update_thread.start()
 
-        self.tick_thread = threading.Thread(target=self.tick_loop)
-        self.tick_thread.start()
-        self.user_binding_thread = threading.Thread(target=self.user_binding_queue)
-        self.user_binding_thread.start()
-        
+        self.after(UI_PUMP_INTERVAL, self.pump_ui)
+        self.after(UI_PUMP_INTERVAL, self.show_router_password)
+        self.after(UI_PUMP_INTERVAL, self.enable_router_buttons)
         try:
             self.mainloop()
         except KeyboardInterrupt:
             print("Exiting...")
         finally:
             self.running = False
-            task_queue.put((None, None, None))
-            update_queue.put(None)
-            self.webserver_thread.join()
-            self.tick_thread.join()
-            self.user_binding_thread.join()
-            task_queue.join()
-            update_queue.join()
+            self.service.stop()
+            self.update_thread.join()
             self.destroy()
         ##########################
         
@@ -181,12 +159,33 @@ class App(customtkinter.CTk):
                 duration = 60
         except:
             duration = 60
-        with self.manager_lock:
-            code = self.manager.generate_code_string()
-            success = self.webserver.add_code(code, duration)
-            if success:
-                self.newcode.configure(text=code)
-                self.update_code_list()
+        code = self.service.generate_code(duration)
+        if code:
+            self.newcode.configure(text=code)
+
+    def generate_vouchers_event(self):
+        dialog = customtkinter.CTkInputDialog(text=f"Enter number of vouchers:\n(min= 1, max= {MAX_VOUCHER_BATCH})", title="Generate Vouchers")
+        x, y = self.calculate_box_center(dialog)
+        if x is not None and y is not None:
+            dialog.geometry("+{}+{}".format(x, y))
+        count = dialog.get_input()
+        dialog = customtkinter.CTkInputDialog(text="Enter code duration:\n(min= 5, max= 60)", title="Generate Vouchers")
+        x, y = self.calculate_box_center(dialog)
+        if x is not None and y is not None:
+            dialog.geometry("+{}+{}".format(x, y))
+        duration = dialog.get_input()
+        try:
+            count = max(1, min(MAX_VOUCHER_BATCH, int(count)))
+            duration = float(duration)
+        except:
+            return False
+        try:
+            csv_path, sheet_path = self.service.generate_vouchers(count, duration)
+            tkinter.messagebox.showinfo("Generate Vouchers", f"{count} vouchers saved to:\n{csv_path}\n{sheet_path}")
+        except Exception as e:
+            print(f"Error in generate_vouchers_event: {e}")
+            traceback.print_exc()
+            return False
 
     def temporary_unblock_event(self):
         dialog = customtkinter.CTkInputDialog(text='Are you sure you want to temporarily unblock the currently blocked devices?\nIf yes, type in "unblock" without the quotation marks.', title="Unblock Devices")
@@ -196,8 +195,7 @@ class App(customtkinter.CTk):
         answer = dialog.get_input()
         try:
             if answer == "unblock":
-                with self.router_lock:
-                    self.router.unblock_all_devices()
+                self.service.unblock_all()
             else:
                 return False
         except Exception as e:
@@ -206,10 +204,7 @@ class App(customtkinter.CTk):
             return False
         
     def delete_row_buton_event(self, code):
-        with self.manager_lock:
-            self.manager.delete_code(code)
-            self.webserver.delete_code(code)
-            self.update_code_list()
+        self.service.delete_code(code)
         
     def reset_db_button_event(self):
         dialog = customtkinter.CTkInputDialog(text='Are you sure you want to reset the database?\nIf yes, type in "reset" without the quotation marks.', title="Reset Database")
@@ -219,8 +214,7 @@ class App(customtkinter.CTk):
         answer = dialog.get_input()
         try:
             if answer == "reset":
-                self.webserver.reset_database()
-                self.update_code_list()
+                self.service.reset_database()
             else:
                 return False
         except Exception as e:
@@ -228,145 +222,52 @@ class App(customtkinter.CTk):
             traceback.print_exc()
             return False
         
-    def update_code_list(self):
-        try:
-            codes = self.webserver.get_all_codes()
-            update_queue.put(codes)
-        except Exception as e:
-            print(f"Error in update_code_list: {e}")
-            traceback.print_exc()
-
+    # Builds the rows for the code table on a worker thread. The rows are handed to the Tk main loop by pump_ui
     def update_frame(self, codes):
-        with self.ui_lock: 
-            children = self.inner_frame.winfo_children()[4:]
-            rows = self.rows.group_children_to_rows(children)
-
-            total_rows = len(rows)
-
-            for c, code in enumerate(codes):
-                key, status, init_duration = code
-                users, time_remaining = self.manager.get_code_info(key)
-                if time_remaining is None:
-                    time_remaining = init_duration
-                else:
-                    self.webserver.update_code(key, time_remaining) # update time remaining in database
-                if c < total_rows:
-                    self.rows.update_row(rows[c], key, status, users, time_remaining)
-                else:
-                    self.rows.create_row(c + 1, key, status, users, time_remaining)
-
-            self.rows.delete_extra_rows(rows, len(codes))
-
-
-    def setup_environment(self):
-        with self.manager_lock:
-            with self.router_lock:
-                try:
-                    print("Setting up environment...")
-                    new_router_password = self.manager.generate_code_string()
-                    newday = self.webserver.is_new_day()
-                    old_router_password = self.webserver.get_router_password()
-                    if newday:
-                        password_change_success = self.router.change_router_password(new_router_password)
-                        if password_change_success:
-                            self.router.unblock_all_devices()
-                            self.webserver.reset_database()
-                            self.webserver.change_router_password(new_router_password)
-                            self.scrollable_frame.configure(label_text=f"Today's Password: {new_router_password}")
-                        else:
-                            print(f"Password change failed. Using old password {old_router_password}.")
-                            self.scrollable_frame.configure(label_text=f"Today's Password: {old_router_password}")
-                        print("New day!")
-                    else:
-                        print(f"Same day! Using old password {old_router_password}.")
-                        self.scrollable_frame.configure(label_text=f"Today's Password: {old_router_password}")
-                        # load existing codes in case app didn't shut down properly
-                        codes = self.webserver.get_all_codes()
-                        # create a dictionary with used codes using code as key and time remaining as value
-                        used_codes = {c[0]: c[2] for c in codes if c[1] == "Used"}
-                        registrants = self.webserver.get_all_registration()
-                        for r in registrants:
-                            mac, code = r
-                            if code in used_codes:
-                                self.manager.bind_user_to_code(code, mac, used_codes[code])
-                    self.update_code_list()
-                except Exception as e:
-                    print(f"Error in setup_environment: {e}")
-                    traceback.print_exc()
-
-
-    def on_submit_success(self, ip, code, duration):
-        with self.router_lock:
-            mac = self.router.get_one_connected_device(ip)
-            print(f"Form submitted successfully! IP: {ip}, MAC: {mac} Code: {code}")
-            if mac:
-                with self.manager_lock:
-                    self.manager.bind_user_to_code(code, mac, duration)
-                    self.webserver.update_registration(ip, mac) # update registration in database
-
-
-    def on_code_expired(self,codes):
-        if codes:
-            self.webserver.delete_expired_codes(codes)
-
-
-    def tick_loop(self):
-        def scheduled_tick():
-            with self.manager_lock:
-                with self.router_lock:
-                    try:
-                        print(f"############################Tick: {self.minute_counter}")
-                        foreign_users = self.router.get_all_connected_devices()
-                        to_block = self.manager.tick(foreign_users)
-                        if to_block is not None:
-                            for mac in to_block:
-                                self.router.block_device(mac)
-                        self.minute_counter += 1
-                        self.update_code_list()
-                        if self.minute_counter == UNBLOCK_SCHEDULE:
-                            self.minute_counter = 0
-                            self.router.unblock_all_devices()
-                    except Exception as e:
-                        print(f"Error in scheduled_tick: {e}")
-                        traceback.print_exc()
-
-            if self.running:
-                scheduler = sched.scheduler(time.time, time.sleep)
-                scheduler.enter(TICK_INTERVAL, 1, scheduled_tick, ())  # Schedule the first tick
-                scheduler.run()
-
-        scheduled_tick()  # kick off scheduler
-
-
-
-    def user_binding_queue(self):
-        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
-            while True:
-                try:
-                    ip, code, duration = task_queue.get()
-                    print("-----------------------------------------------Got task from queue")
-                    if ip is None:
-                        print("Got None task, exiting")
-                        break
-                    executor.submit(self.on_submit_success, ip, code, duration)
-                    task_queue.task_done()  # Mark the task as done
-                except Exception as e:
-                    print(f"Error in user_binding_queue: {e}")
-                    traceback.print_exc()
-
+        self.row_channel.publish(self.service.get_code_rows(codes))
+
+    # Renders the latest rows on the Tk main loop, since Tk widgets must only be touched from the thread running it
+    def pump_ui(self):
+        snapshot = self.row_channel.take()
+        if snapshot is not None:
+            version, entries = snapshot
+            try:
+                self.rows.render(entries)
+            except Exception as e:
+                print(f"Error in pump_ui: {e}")
+                traceback.print_exc()
+        if self.running:
+            self.after(UI_PUMP_INTERVAL, self.pump_ui)
+
+
+    # Shows today's password once the service has prepared the day
+    def show_router_password(self):
+        if self.service.startup.is_ready("environment"):
+            self.scrollable_frame.configure(label_text=f"Today's Password: {self.service.router_password}")
+        elif self.running:
+            self.after(UI_PUMP_INTERVAL, self.show_router_password)
+
+    # Enables the buttons that use the router once it is logged in, so they never wait for startup on the Tk main loop
+    def enable_router_buttons(self):
+        if self.service.startup.is_ready("router"):
+            self.unblock_button.configure(state="normal")
+        elif self.running:
+            self.after(UI_PUMP_INTERVAL, self.enable_router_buttons)
+
+    # Builds the rows from the newest code list only. Code lists published while a build is running are coalesced
     def update_queue(self):
-        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
-            while True:
-                try:
-                    codes = update_queue.get()
-                    if codes is None:
-                        print("Got None update task, exiting")
-                        break
-                    executor.submit(self.update_frame, codes)
-                    update_queue.task_done()
-                except Exception as e:
-                    print(f"Error in update_queue: {e}")
-                    traceback.print_exc()    
+        while True:
+            try:
+                snapshot = self.service.code_channel.wait()
+                if snapshot is None:
+                    print("Code channel closed, exiting")
+                    break
+                version, codes = snapshot
+                self.update_frame(codes)
+            except Exception as e:
+                print(f"Error in update_queue: {e}")
+                traceback.print_exc()
+        print(f"Code channel stats: {self.service.code_channel.stats} Row channel stats: {self.row_channel.stats}")
 
 
 def handle_sigint(sig, frame):
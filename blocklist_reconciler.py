@@ -0,0 +1,69 @@
+import threading
+import time
+
+BLOCK_DURATION = 75 * 60  # seconds a foreign device stays blocked, 1 hour and 15 minutes
+
+# Keeps the router's blocklist in line with the set of devices that should be blocked. Each device is blocked until its own
+# expiry and only the differences between the wanted and the actual blocklist are sent to the router
+class BlocklistReconciler:
+
+    def __init__(self, router, block_duration=BLOCK_DURATION):
+        self._router = router
+        self._block_duration = block_duration
+        self._desired = dict() # a dictionary of mac addresses that should be blocked and when their block expires
+        self._applied = set() # mac addresses believed to be in the router's blocklist
+        self._synced = False # whether the applied set has been read from the router at least once
+        self._lock = threading.Lock()
+
+    # Marks devices to be blocked until the block duration has passed
+    def block(self, devices):
+        expires_at = time.monotonic() + self._block_duration
+        with self._lock:
+            for device in devices:
+                self._desired.setdefault(device, expires_at)
+
+    # Forget every wanted block, used when the whole blocklist is cleared by other means
+    def release_all(self):
+        with self._lock:
+            self._desired.clear()
+            self._applied.clear()
+
+    # Reads the router's actual blocklist. Blocks found on the first read are adopted so a restart doesn't unblock anyone early
+    def _sync(self):
+        actual = self._router.get_blocked_devices()
+        if actual is None:
+            return
+        if not self._synced:
+            expires_at = time.monotonic() + self._block_duration
+            for device in actual:
+                self._desired.setdefault(device, expires_at)
+            self._synced = True
+        self._applied = set(actual)
+
+    # Applies the blocks and unblocks needed to reach the wanted blocklist. Returns the devices added and removed
+    def reconcile(self, resync=False):
+        with self._lock:
+            if resync or not self._synced:
+                self._sync()
+
+            now = time.monotonic()
+            self._desired = {device: expires_at for device, expires_at in self._desired.items() if expires_at > now}
+
+            to_add = [device for device in self._desired if device not in self._applied]
+            to_remove = [device for device in self._applied if device not in self._desired]
+
+            added = []
+            if to_add:
+                added = [device for device, success in self._router.block_devices(to_add).items() if success]
+                self._applied.update(added)
+
+            removed = []
+            if to_remove:
+                results = self._router.unblock_devices(to_remove)
+                removed = [device for device, success in results.items() if success]
+                # devices the router no longer lists are not blocked either
+                self._applied.difference_update(device for device, success in results.items() if success is not False)
+
+            if added or removed:
+                print(f"Blocklist updated. Blocked: {len(added)} Unblocked: {len(removed)} Total: {len(self._applied)}")
+            return (added, removed)
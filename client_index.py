@@ -0,0 +1,64 @@
+import threading
+import time
+
+CLIENT_INDEX_TTL = 90  # seconds an entry from the last poll is trusted, a bit longer than one tick
+
+# In-memory map of the router's clients by ip address. The tick poll keeps it current so lookups don't need the router,
+# and a lookup that misses triggers one targeted refresh that concurrent lookups share
+class ClientIndex:
+
+    def __init__(self, fetch_clients, ttl=CLIENT_INDEX_TTL):
+        self._fetch_clients = fetch_clients # function returning the router's client list
+        self._ttl = ttl
+        self._macs_by_ip = dict() # a dictionary of ip addresses and the mac address using them
+        self._updated_at = None # monotonic time of the last update
+        self._lock = threading.Lock()
+        self._refresh_done = None # event of the refresh currently in flight
+
+    # Replaces the index with a fresh client list from the router
+    def update(self, clients):
+        macs_by_ip = {client["ip"]: client["mac"] for client in clients if client.get("ip")}
+        with self._lock:
+            self._macs_by_ip = macs_by_ip
+            self._updated_at = time.monotonic()
+
+    # Returns True if the index was updated within the ttl
+    def is_fresh(self):
+        with self._lock:
+            return self._updated_at is not None and time.monotonic() - self._updated_at < self._ttl
+
+    # Reads the clients from the router once, no matter how many threads ask for it at the same time
+    def refresh(self):
+        with self._lock:
+            refresh_done = self._refresh_done
+            is_owner = refresh_done is None
+            if is_owner:
+                refresh_done = self._refresh_done = threading.Event()
+        if not is_owner:
+            refresh_done.wait()
+            return
+
+        try:
+            clients = self._fetch_clients()
+            if clients is not None:
+                self.update(clients)
+        except Exception as e:
+            print(f"Could not refresh the client index. Error: {e}")
+        finally:
+            with self._lock:
+                self._refresh_done = None
+            refresh_done.set()
+
+    # Returns the mac address using the ip address, refreshing the index if the entry is missing or stale
+    def lookup(self, ip_address):
+        with self._lock:
+            mac_address = self._macs_by_ip.get(ip_address)
+        if mac_address and self.is_fresh():
+            return mac_address
+
+        self.refresh()
+        with self._lock:
+            mac_address = self._macs_by_ip.get(ip_address)
+        if not mac_address:
+            print(f"Could not find device with IP address: {ip_address}")
+        return mac_address
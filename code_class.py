@@ -1,11 +1,17 @@
+import math
+import time
 from tick_listener import tick_listener
 
 # Code to be used by users to get access to the service. It uses the tick_listener interface to notify the code manager when the timer is up and the code should be kicked
 class Code(tick_listener):
-    def __init__(self, code, time_left=60):
+    # codes are created for every redemption, slots keep them to their three fields
+    __slots__ = ("_code", "_users", "_expires_at")
+
+    # expires_at restores a code with its original deadline instead of one counted from now
+    def __init__(self, code, time_left=60, expires_at=None):
         self._code = code
-        self._users = set()  # a list of mac addresses using set to avoid duplicates
-        self._time_left = time_left  # time left in minutes
+        self._users = set()  # the MacAddress values of the devices using the code
+        self._expires_at = expires_at if expires_at is not None else time.time() + time_left * 60  # wall-clock time the code expires at
 
     # override equals method
     def __eq__(self, other):
@@ -23,16 +29,19 @@ class Code(tick_listener):
         self._users.discard(user_mac_address)
         print(f"User: {user_mac_address} removed from code: {self._code}")
 
-    # Removes time from time_left
+    # Reports the time left. Time is no longer counted down here since the code expires at a fixed deadline
     def update(self):
-        if(self._time_left > 0):
-            self._time_left -= 1
-        print(f"Code: {self._code} time left: {str(self._time_left)}")
+        print(f"Code: {self._code} time left: {str(self.time_left)}")
        
-    # Returns the amount of time left on the code
+    # Returns the amount of time left on the code in whole minutes, computed from the deadline
     @property
     def time_left(self):
-        return self._time_left
+        return max(0, math.ceil((self._expires_at - time.time()) / 60))
+
+    # Returns the wall-clock time the code expires at
+    @property
+    def expires_at(self):
+        return self._expires_at
     
     # Returns the code string
     @property
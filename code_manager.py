@@ -1,8 +1,13 @@
+import heapq
 import threading
+import time
 import random
 import string
 
 from code_class import Code
+from foreign_tracker import ForeignUserTracker
+from mac_address import parse_mac, MacAddress
+from manager_store import SNAPSHOT_INTERVAL, StateCorrupted
 
 #  Class that manages the codes and the users associated with it
 class CodeManager:
@@ -10,14 +15,20 @@ class CodeManager:
     #constant for foreign user time limit
     FOREIGN_USER_TIME_LIMIT = 5 # 5 minutes
 
-    # Constructor
-    def __init__(self, on_code_expired_callback=None):
+    __slots__ = ("_timed_codes", "_expiry_heap", "_timed_users", "_user_list", "_foreign_users", "_lock", "_on_code_expired_callback",
+                 "_store", "_last_snapshot")
+
+    # Constructor. The store, when given, keeps a snapshot and a journal of the state so it can be restored after a restart
+    def __init__(self, on_code_expired_callback=None, store=None):
         self._timed_codes = dict() # a list of codes currently in use
-        self._timed_users = set() # a list of users using codes
-        self._user_list = dict() # a dictionary of mac addresses and their associated codes
-        self._foreign_users = dict() # a list of mac addresses that are not using a code
+        self._expiry_heap = [] # a min-heap of (expiry time, code) so expired codes are found without visiting every code
+        self._timed_users = set() # the MacAddress values of users using codes
+        self._user_list = dict() # a dictionary of MacAddress values and their associated codes
+        self._foreign_users = ForeignUserTracker(self.FOREIGN_USER_TIME_LIMIT * 60) # mac addresses that are not using a code
         self._lock = threading.Lock()  # Add a lock
         self._on_code_expired_callback = on_code_expired_callback
+        self._store = store
+        self._last_snapshot = time.monotonic()
 
     # Generates a string of 11 characters as code and add it to the list of codes
     def generate_code_string(self):
@@ -26,74 +37,205 @@ class CodeManager:
         # print (f"Code generated: {code_string}")
         return code_string
 
+    # Generates a set of unique code strings
+    def generate_code_strings(self, count):
+        codes = set()
+        while len(codes) < count:
+            codes.add(self.generate_code_string())
+        return codes
+
     # Creates a code object and bind a mac address to it then add them to their appropriate lists. If code object does not exist, create it
     def bind_user_to_code(self, code, mac_address, duration):
+        mac_address = parse_mac(mac_address)
+        if mac_address is None:
+            print(f"Could not bind code {code}. Invalid MAC address.")
+            return
         # add a lock to the function
         with self._lock:
-            if mac_address in self._user_list: # check if the user is already using a code
-                old_code = self._user_list[mac_address]
-                if old_code in self._timed_codes:
-                    self._timed_codes[old_code].remove_user(mac_address)
             if code in self._timed_codes:
-                self._timed_codes[code].add_user(mac_address)
+                expires_at = self._timed_codes[code].expires_at
             else:
-                code_object = Code(code, duration)
-                code_object.add_user(mac_address)
-                self._timed_codes[code] = code_object # add the code to the list of codes
-            self._timed_users.add(mac_address) # add the user to timed users
-            self._user_list[mac_address] = code # add the user to the list of all users or update its code value
+                expires_at = time.time() + duration * 60
+            self._bind(code, mac_address, expires_at)
+            self._write_journal(["bind", code, int(mac_address), expires_at])
+        # the disk write happens outside the lock so redemptions and ticks don't wait on it
+        self._flush_journal()
+
+    # Binds the user to the code, creating the code with the given deadline if it is not in use yet
+    def _bind(self, code, mac_address, expires_at):
+        if mac_address in self._user_list: # check if the user is already using a code
+            old_code = self._user_list[mac_address]
+            if old_code in self._timed_codes:
+                self._timed_codes[old_code].remove_user(mac_address)
+        if code in self._timed_codes:
+            self._timed_codes[code].add_user(mac_address)
+        else:
+            code_object = Code(code, expires_at=expires_at)
+            code_object.add_user(mac_address)
+            self._timed_codes[code] = code_object # add the code to the list of codes
+            heapq.heappush(self._expiry_heap, (code_object.expires_at, code))
+        self._timed_users.add(mac_address) # add the user to timed users
+        self._foreign_users.discard(mac_address) # registered users must not be blocked
+        self._user_list[mac_address] = code # add the user to the list of all users or update its code value
 
 
+    # Removes the codes whose deadline has passed and returns them. Only the expired codes are visited
+    def _expire_codes(self):
+        now = time.time()
+        expired_codes = [] # list of expired codes
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, code = heapq.heappop(self._expiry_heap)
+            code_object = self._timed_codes.get(code)
+            # skip entries of codes that were deleted or replaced since they were pushed
+            if code_object is None or code_object.expires_at != expires_at:
+                continue
+            self._delete(code)
+            expired_codes.append(code) # add the code to the list of expired codes
+        return expired_codes
+
     # Function called by the timer to update the codes
     def tick(self, connected_users):
         with self._lock:
-            expired_codes = [] # list of expired codes
-            for code in self._timed_codes.values():
-                code.update()
-                if code.time_left <= 0: # check if the code has expired
-                    self._timed_users.difference_update(code.users) # remove users from the set of users using the code
-                    expired_codes.append(code.code) # add the code to the list of expired codes
-
-            self._timed_codes = {code_key: code for code_key, code in self._timed_codes.items() if code.time_left > 0} # remove expired codes from the dictionary of codes
+            expired_codes = self._expire_codes()
             print(f"Codes: {len(self._timed_codes)} Users: {len(self._timed_users)}")
 
             # Send the expired codes to callback
             if expired_codes:
                 self._on_code_expired_callback(expired_codes)
 
-            # Remove users in timed_users from foreign_users. Necessary to prevent registered users from being blocked.
-            self._foreign_users = {mac: time_limit for mac, time_limit in self._foreign_users.items() if mac not in self._timed_users}
-
             # check if connected_users is not None
             if connected_users is not None:
 
-                # remove timed users from the set of connected users
-                connected_users.difference_update(self._timed_users) 
-
-                # remove foreign users that are not in the connected users 
-                self._foreign_users = {mac: time_limit for mac, time_limit in self._foreign_users.items() if mac in connected_users}
-
-                # add connected users to the list of foreign users if they are not yet on the list and add a time limit
-                self._foreign_users.update({mac: self.FOREIGN_USER_TIME_LIMIT for mac in connected_users if mac not in self._foreign_users})
-
-                # update the time limit of foreign users
-                self._foreign_users = {mac: time_limit - 1 for mac, time_limit in self._foreign_users.items() if time_limit > 0}
-
-                # return a list of mac address that have exceeded the time limit
+                # apply the new snapshot to the foreign users and get the ones that have exceeded the time limit
+                to_block = self._foreign_users.update(connected_users, self._timed_users)
                 self.print_status()
-                return [mac for mac, time_limit in self._foreign_users.items() if time_limit <= 0]
             else:
                 self.print_status()
                 print("No connected users found.")
-                return None
+                to_block = None
+
+            snapshot = self._take_snapshot() if time.monotonic() - self._last_snapshot >= SNAPSHOT_INTERVAL else None
+        self._write_snapshot(snapshot)
+        return to_block
     
     def delete_code(self, code):
         with self._lock:
             if code in self._timed_codes:
-                code_object = self._timed_codes[code]
-                self._timed_users.difference_update(code_object.users)
-                del self._timed_codes[code]
+                self._delete(code)
+                self._write_journal(["delete", code])
                 self.print_status()
+        self._flush_journal()
+
+    # Removes the code and hands its users that are still connected to the foreign user tracker
+    def _delete(self, code):
+        if code in self._timed_codes:
+            code_object = self._timed_codes[code]
+            self._timed_users.difference_update(code_object.users) # remove users from the set of users using the code
+            del self._timed_codes[code]
+            self._foreign_users.release(code_object.users, self._timed_users)
+
+    ### Saved state ###
+
+    # Queues a journal record. Called under the lock so the records keep the order of the changes
+    def _write_journal(self, record):
+        if self._store is None:
+            return
+        self._store.append(record)
+
+    def _flush_journal(self):
+        if self._store is None:
+            return
+        try:
+            self._store.flush()
+        except Exception as e:
+            print(f"Error writing the code manager journal: {e}")
+
+    # Captures the state for a snapshot, must be called under the lock. Returns (generation, state) or None without a store
+    def _take_snapshot(self):
+        self._last_snapshot = time.monotonic()
+        if self._store is None:
+            return None
+        state = {
+            "codes": [[code, code_object.expires_at, [int(mac_address) for mac_address in code_object.users]] for code, code_object in self._timed_codes.items()],
+            "foreign_users": [[int(mac_address), first_seen] for mac_address, first_seen in self._foreign_users.first_seen.items()],
+        }
+        return (self._store.start_snapshot(), state)
+
+    # Writes a snapshot captured by _take_snapshot, outside the lock
+    def _write_snapshot(self, snapshot):
+        if snapshot is None:
+            return
+        generation, state = snapshot
+        try:
+            self._store.write_snapshot(state, generation)
+        except Exception as e:
+            print(f"Error writing the code manager snapshot: {e}")
+
+    # Writes a snapshot now, used after restoring from the database and when shutting down
+    def save_snapshot(self):
+        with self._lock:
+            snapshot = self._take_snapshot()
+        self._write_snapshot(snapshot)
+
+    # Rebuilds the codes, users and foreign user timers from the saved snapshot and journal. Returns False when there is no
+    # saved state or it is damaged or unreadable, the caller then restores from the database instead
+    def restore(self):
+        if self._store is None:
+            return False
+        started = time.monotonic()
+        with self._lock:
+            try:
+                saved = self._store.load()
+                if saved is None:
+                    print("No saved code manager state.")
+                    return False
+                saved_at, state, records = saved
+                now = time.time()
+                for code, expires_at, users in state.get("codes", []):
+                    if expires_at > now:
+                        for mac_address in users:
+                            self._bind(code, MacAddress(mac_address), expires_at)
+                # a device first seen before a long stop may have left and come back since, so it gets a new grace period
+                if saved_at is not None and now - saved_at < self.FOREIGN_USER_TIME_LIMIT * 60:
+                    self._foreign_users.restore({MacAddress(mac_address): first_seen for mac_address, first_seen in state.get("foreign_users", [])})
+                for record in records:
+                    if record[0] == "bind":
+                        _, code, mac_address, expires_at = record
+                        if expires_at > now:
+                            self._bind(code, MacAddress(mac_address), expires_at)
+                    elif record[0] == "delete":
+                        self._delete(record[1])
+                    else:
+                        raise StateCorrupted(f"Unknown journal record {record[0]}")
+            except (StateCorrupted, OSError, ValueError, TypeError, KeyError, IndexError) as e:
+                print(f"Saved code manager state is damaged or unreadable, restoring from the database instead. Error: {e}")
+                self._timed_codes.clear()
+                self._expiry_heap.clear()
+                self._timed_users.clear()
+                self._user_list.clear()
+                self._foreign_users = ForeignUserTracker(self.FOREIGN_USER_TIME_LIMIT * 60)
+                try:
+                    self._store.clear()
+                except OSError as e:
+                    print(f"Could not remove the saved code manager state. Error: {e}")
+                return False
+            # fold the replayed journal into a fresh snapshot
+            snapshot = self._take_snapshot()
+        self._write_snapshot(snapshot)
+        print(f"Restored {len(self._timed_codes)} codes, {len(self._timed_users)} users and {len(self._foreign_users)} foreign users "
+              f"from {len(records)} journal records in {(time.monotonic() - started) * 1000:.1f}ms")
+        return True
+
+    # Drops the saved state, used when the codes are reset for a new day
+    def clear_saved_state(self):
+        with self._lock:
+            self._last_snapshot = time.monotonic()
+        if self._store is None:
+            return
+        try:
+            self._store.clear()
+        except OSError as e:
+            print(f"Could not remove the saved code manager state. Error: {e}")
 
     # Returns the number of users using the code and the time left
     def get_code_info(self, key):
@@ -111,7 +253,7 @@ class CodeManager:
     def print_status(self):
         print(f"Timed codes {self._timed_codes}")
         print(f"Timed users {self._timed_users}")
-        print(f"Foreign users {self._foreign_users}")
+        print(f"Foreign users {self._foreign_users.first_seen}")
         # pass
 
 
@@ -0,0 +1,14 @@
+# Runs the wifi manager without a display. It is managed through the local admin API instead of the Tk window
+from wifi_service import WifiService
+from admin_api import AdminApi
+
+if __name__ == "__main__":
+    service = WifiService()
+    service.start()
+    service.wait_until_ready()
+    try:
+        AdminApi(service).run()
+    except KeyboardInterrupt:
+        print("Exiting...")
+    finally:
+        service.stop()
@@ -0,0 +1,104 @@
+# database.py
+
+import datetime
+import threading
+import time
+from sqlalchemy import bindparam, event, inspect, select, text, update
+from sqlalchemy.pool import QueuePool
+from .tables import CodeTable, Registration
+
+POOL_SIZE_EXTRA = 4 # connections for the tick, UI and binding threads on top of the web server threads
+POOL_MAX_OVERFLOW = 4
+POOL_TIMEOUT = 10 # seconds to wait for a free connection before giving up
+POOL_RECYCLE = 1800 # seconds before a connection is replaced, kept under MySQL's idle timeout
+
+# QueuePool that records how long checkouts wait for a connection
+class TimedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.monotonic() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+
+def is_sqlite(database_uri):
+    return database_uri.startswith("sqlite")
+
+# Returns the engine options for the database, with a pool sized for the given number of web server threads
+def engine_options(database_uri, server_threads):
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": server_threads + POOL_SIZE_EXTRA,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+    if is_sqlite(database_uri):
+        # connections are shared between threads through the pool
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        options["pool_recycle"] = POOL_RECYCLE
+    return options
+
+# Switches SQLite connections to write-ahead logging so readers don't block the writer
+def enable_sqlite_wal(engine):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+    event.listen(engine, "connect", set_pragmas)
+
+# Returns the usage of the engine's connection pool
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            stats["checkouts"] = pool.checkouts
+            stats["average_wait"] = pool.total_wait / pool.checkouts if pool.checkouts else 0.0
+            stats["max_wait"] = pool.max_wait
+    return stats
+
+# Brings databases created before the expiry timestamps up to date. Missing columns and indexes are added and codes already
+# in use get an expiry time from the minutes they had left, which is what the time column used to hold
+def migrate_schema(engine):
+    code_table = CodeTable.__table__
+    existing_columns = {column["name"] for column in inspect(engine).get_columns(code_table.name)}
+    missing_columns = [column for column in (code_table.c.redeemed_at, code_table.c.expires_at) if column.name not in existing_columns]
+
+    if missing_columns:
+        with engine.begin() as connection:
+            for column in missing_columns:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {code_table.name} ADD COLUMN {column.name} {column_type} NULL"))
+
+            now = datetime.datetime.now()
+            used_codes = connection.execute(select(code_table.c.code, code_table.c.time).where(code_table.c.used == True)).all()
+            if used_codes:
+                connection.execute(
+                    update(code_table).where(code_table.c.code == bindparam("used_code")).values(redeemed_at=bindparam("redeemed"), expires_at=bindparam("expires")),
+                    [{"used_code": code, "redeemed": now, "expires": now + datetime.timedelta(minutes=minutes or 0)} for code, minutes in used_codes])
+            print(f"Migrated code table: added {', '.join(column.name for column in missing_columns)}, set expiry of {len(used_codes)} used codes.")
+
+    for table in (code_table, Registration.__table__):
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
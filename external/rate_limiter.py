@@ -0,0 +1,34 @@
+# rate_limiter.py
+
+import threading
+import time
+from collections import OrderedDict
+
+# Token bucket rate limiter keyed by client. Each key refills `rate` tokens per second up to `burst` and every request takes
+# one token. Only the `max_keys` most recently used buckets are kept, idle ones are evicted first
+class RateLimiter:
+
+    def __init__(self, rate, burst, max_keys=4096):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.throttled_count = 0 # number of requests rejected so far
+        self._buckets = OrderedDict() # key -> (tokens, last refill time), least recently used first
+        self._lock = threading.Lock()
+
+    # take a token for the key. Returns False if the key has run out of tokens
+    def allow(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last_refill = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last_refill) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.throttled_count += 1
+            self._buckets[key] = (tokens, now)
+            # evict the least recently used buckets
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
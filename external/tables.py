@@ -1,18 +1,34 @@
 # tables.py
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.types import TypeDecorator, String
+from mac_address import parse_mac
 
 db = SQLAlchemy()
 
+# Stores mac addresses in the router's display format and loads them back as MacAddress values
+class MacColumn(TypeDecorator):
+    impl = String(20)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        mac_address = parse_mac(value)
+        return mac_address.display if mac_address is not None else value
+
+    def process_result_value(self, value, dialect):
+        return parse_mac(value)
+
 class CodeTable(db.Model):
     code = db.Column(db.String(11), primary_key=True)
     used = db.Column(db.Boolean, default=False)
-    time = db.Column(db.Integer, default=False)
+    time = db.Column(db.Integer, default=False) # duration of the code in minutes
+    redeemed_at = db.Column(db.DateTime, nullable=True) # when the code was first used
+    expires_at = db.Column(db.DateTime, nullable=True, index=True) # when the code stops working, set on first use
 
 class Registration(db.Model):
     ip_address = db.Column(db.String(20), primary_key=True)
-    code = db.Column(db.String(11))
-    mac = db.Column(db.String(20))
+    code = db.Column(db.String(11), index=True)
+    mac = db.Column(MacColumn, index=True)
 
 class TodayDate(db.Model):
     date = db.Column(db.String(10), primary_key=True)
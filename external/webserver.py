@@ -1,31 +1,45 @@
+from collections import deque
 from datetime import date
 import datetime
 import json
+import math
 import signal
+import threading
 from flask import Flask, render_template, request
+from sqlalchemy import delete, insert, or_
 from .tables import db, CodeTable, Registration, TodayDate
+from .rate_limiter import RateLimiter
+from .database import engine_options, enable_sqlite_wal, is_sqlite, migrate_schema, pool_stats
 from config import database_config, default_wifi_password
-from waitress import serve
+from waitress import create_server
+
+BULK_QUERY_SIZE = 900 # codes per IN (...) lookup, below SQLite's bound parameter limit
+SERVER_THREADS = 8 # waitress worker threads, the database pool is sized from it
+SUBMIT_RATE = 0.2 # code attempts per second each IP address earns, one every 5 seconds
+SUBMIT_BURST = 5 # code attempts an IP address can make back to back
 
 class WebServer:
 
-    def __init__(self, on_success_callback=None):
+    def __init__(self, on_success_callback=None, submit_rate=SUBMIT_RATE, submit_burst=SUBMIT_BURST):
         self.app = Flask(__name__)
         self.on_success_callback = on_success_callback
         self.default_code_duration = 60
         self.server = None
+        self.listening = threading.Event() # set once the portal socket is bound and accepting connections
+        self.redemptions_open = threading.Event() # set once the day is prepared and codes can be redeemed
+        self._held_submissions = deque() # (code, ip) accepted before redemptions opened
+        self._held_lock = threading.Lock()
+        self._valid_codes = set() # codes in the code table, so invalid codes are rejected without a query
+        self._codes_lock = threading.Lock()
+        self.rate_limiter = RateLimiter(submit_rate, submit_burst) # limits code attempts per IP address
 
         # database configuration
         self.app.config['SQLALCHEMY_DATABASE_URI'] = database_config
         self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_config, SERVER_THREADS)
         self.db = db
         self.db.init_app(self.app)
 
-        # save the database
-        with self.app.app_context():
-            self.db.create_all()
-            db.session.commit()
-
 
 
         # Routes and views
@@ -36,6 +50,10 @@ class WebServer:
 
         @self.app.route('/submit', methods=['POST'])
         def submit_form():
+            # turn away clients that are sending too many attempts before doing any work
+            if not self.rate_limiter.allow(request.remote_addr):
+                return 'Too many attempts, please wait a moment and try again.', 429
+
             # check if the code from the form is not empty and sanitize it
             code = request.form.get('code', '').strip().upper()
 
@@ -50,38 +68,85 @@ class WebServer:
             if error:
                 return render_template('index.html', error=error)
 
-            # check if the code exists in the code table
-            code_obj = CodeTable.query.filter_by(code=code).first()
-            if code_obj:
+            # reject codes that are not in the code table without touching the database
+            if not self.is_valid_code(code):
+                return render_template('index.html', error=f'Code {code} is invalid!')
+
+            # grab the IP address of the user
+            ip = request.remote_addr
+            # the portal is up before the day is prepared, codes sent until then are redeemed once it is
+            if self.hold_submission(code, ip):
+                return render_template('index.html', error=f'Code {code} received, it will be activated in a moment.')
+            duration = self.redeem_code(code, ip)
+            if duration is None:
+                return render_template('index.html', error=f'Code {code} could not be redeemed!')
+
+            if self.on_success_callback:
+                self.on_success_callback((ip, code, duration))  # Call the callback function
+            return render_template('success.html')
+
+    # Holds the submission if redemptions are not open yet. Returns True if it was held
+    def hold_submission(self, code, ip):
+        with self._held_lock:
+            if self.redemptions_open.is_set():
+                return False
+            self._held_submissions.append((code, ip))
+            print(f"Holding code {code} from IP {ip} until redemptions open.")
+            return True
+
+    # Opens redemptions and redeems the submissions held until now, in the order they came in
+    def open_redemptions(self):
+        with self._held_lock:
+            self.redemptions_open.set()
+            held = list(self._held_submissions)
+            self._held_submissions.clear()
+        for code, ip in held:
+            if not self.is_valid_code(code):
+                print(f"Held code {code} from IP {ip} is no longer valid.")
+                continue
+            duration = self.redeem_code(code, ip)
+            if duration is None:
+                print(f"Held code {code} from IP {ip} could not be redeemed.")
+            elif self.on_success_callback:
+                self.on_success_callback((ip, code, duration))
+
+    # check the code against the in-memory set of codes
+    def is_valid_code(self, code):
+        with self._codes_lock:
+            return code in self._valid_codes
+
+    # mark the code as used and register the IP address to it in a single transaction. The code's expiry is set on first use.
+    # Returns the minutes left on the code or None
+    def redeem_code(self, code, ip):
+        with self.app.app_context():
+            try:
+                code_obj = db.session.get(CodeTable, code)
+                now = datetime.datetime.now()
+                if code_obj is None:
+                    with self._codes_lock:
+                        self._valid_codes.discard(code)
+                    return None
+                if code_obj.expires_at is not None and code_obj.expires_at <= now:
+                    return None
+                if code_obj.expires_at is None:
+                    code_obj.redeemed_at = now
+                    code_obj.expires_at = now + datetime.timedelta(minutes=code_obj.time)
                 code_obj.used = True
-                self.db.session.commit()
-                duration = code_obj.time
-                # grab the IP address of the user
-                ip = request.remote_addr
 
                 # add the IP address and code to the Registration table
-                device_entry = Registration.query.filter_by(ip_address=ip).first()
+                device_entry = db.session.get(Registration, ip)
                 if device_entry:
                     device_entry.code = code
                 else:
-                    registration = Registration(ip_address=ip, code=code)
-                    self.db.session.add(registration)
+                    db.session.add(Registration(ip_address=ip, code=code))
 
-                try:
-                    self.db.session.commit()
-                    if self.on_success_callback:
-                        self.on_success_callback((ip, code, duration))  # Call the callback function 
-                except Exception as e:
-                    print(f"Error committing changes to database: {e}")
-                    self.db.session.rollback()
-
-                return render_template('success.html')
-            else:
-                error = f'Code {code} is invalid!'
-
-            return render_template('index.html', error=error)
-
-       
+                minutes_left = (code_obj.expires_at - now).total_seconds() / 60
+                db.session.commit()
+                return minutes_left
+            except Exception as e:
+                print(f"Error committing changes to database: {e}")
+                db.session.rollback()
+                return None
 
     def add_code(self, code, time=None):
         with self.app.app_context():
@@ -96,6 +161,8 @@ class WebServer:
                 db.session.add(code_obj)
                 try:
                     db.session.commit()
+                    with self._codes_lock:
+                        self._valid_codes.add(code)
                     print(f"Code {code} added to the database.")
                     return True
                 except Exception as e:
@@ -103,29 +170,53 @@ class WebServer:
                     db.session.rollback()   
                     return False
 
-    def get_all_registration(self):
+    # add many codes with a single bulk INSERT. Codes that already exist are skipped. Returns the list of codes added
+    def add_codes(self, codes, time=None):
+        codes = list(codes)
+        time = self.default_code_duration if time is None else time
+        with self.app.app_context():
+            try:
+                # find collisions with one indexed lookup per chunk instead of one query per code
+                existing = set()
+                for i in range(0, len(codes), BULK_QUERY_SIZE):
+                    chunk = codes[i:i + BULK_QUERY_SIZE]
+                    existing.update(code for (code,) in db.session.query(CodeTable.code).filter(CodeTable.code.in_(chunk)))
+                new_codes = [code for code in codes if code not in existing]
+                if new_codes:
+                    db.session.execute(insert(CodeTable), [{"code": code, "used": False, "time": time} for code in new_codes])
+                    db.session.commit()
+                with self._codes_lock:
+                    self._valid_codes.update(new_codes)
+                print(f"{len(new_codes)} codes added to the database.")
+                return new_codes
+            except Exception as e:
+                print(f"Error committing changes to database: {e}")
+                db.session.rollback()
+                return []
+
+    # returns the registered devices whose code has not expired as (mac, code, minutes left), using the expires_at index
+    def get_active_registrations(self):
         with self.app.app_context():
             try:
-                devices = Registration.query.all()
-                device_list = []
-                for d in devices:
-                    mac = d.mac
-                    code = d.code
-                    device_list.append((mac, code))
-                return device_list
+                now = datetime.datetime.now()
+                rows = db.session.query(Registration.mac, Registration.code, CodeTable.expires_at) \
+                    .join(CodeTable, CodeTable.code == Registration.code) \
+                    .filter(CodeTable.expires_at > now, Registration.mac.isnot(None)).all()
+                return [(mac, code, (expires_at - now).total_seconds() / 60) for mac, code, expires_at in rows]
             except Exception as e:
-                print(f"Error querying database to get all registrations: {e}")
+                print(f"Error querying database to get active registrations: {e}")
                 return []
-            
-    # query the database for all codes and return them
+
+    # query the database for all codes that have not expired and return them. Used codes report the minutes they have left
     def get_all_codes(self):
         with self.app.app_context():
             try:
-                codes = CodeTable.query.all()
+                now = datetime.datetime.now()
+                codes = CodeTable.query.filter(or_(CodeTable.expires_at.is_(None), CodeTable.expires_at > now)).all()
                 code_list = []
                 for c in codes:
                     code = c.code
-                    duration = c.time
+                    duration = c.time if c.expires_at is None else math.ceil((c.expires_at - now).total_seconds() / 60)
                     status = "Used" if c.used else "Unused"
                     code_list.append((code, status, duration))
                 return code_list
@@ -133,20 +224,6 @@ class WebServer:
                 print(f"Error querying database to get all codes: {e}")
                 return []
             
-    def update_code(self, code, time):
-        with self.app.app_context():
-            code_obj = CodeTable.query.filter_by(code=code).first()
-            if code_obj:
-                code_obj.time = time
-                try:
-                    db.session.commit()
-                    print(f"Code: {code} Time: {code_obj.time} updated in the database.")
-                except Exception as e:
-                    print(f"Error updating code {code} in the database: {e}")
-                    db.session.rollback()
-            else:
-                print(f"Code {code} does not exist in the database.")
-
     def update_registration(self, ip, mac):
         with self.app.app_context():
             device_entry = Registration.query.filter_by(ip_address=ip).first()
@@ -162,38 +239,60 @@ class WebServer:
                 print(f"IP {ip} does not exist in the database.")
    
     def delete_code(self, code):
+        deleted = self.delete_codes([code])
+        if deleted:
+            print(f"Code {code} deleted from the database.")
+        else:
+            print(f"Code {code} does not exist in the database.")
+
+    # delete the codes and their registrations with one DELETE per table in a single transaction. Returns the number of codes deleted
+    def delete_codes(self, codes):
+        if not codes:
+            return 0
         with self.app.app_context():
-            code_obj = CodeTable.query.filter_by(code=code).first()
-            if code_obj:
-                try:
-                    db.session.delete(code_obj)
-                    db.session.commit()
-                    print(f"Code {code} deleted from the database.")
-                except Exception as e:
-                    print(f"Error deleting code {code} in the database: {e}")
-                    db.session.rollback()
-            else:
-                print(f"Code {code} does not exist in the database.")
+            try:
+                codes = list(codes)
+                result = db.session.execute(delete(CodeTable).where(CodeTable.code.in_(codes)), execution_options={"synchronize_session": False})
+                db.session.execute(delete(Registration).where(Registration.code.in_(codes)), execution_options={"synchronize_session": False})
+                db.session.commit()
+                with self._codes_lock:
+                    self._valid_codes.difference_update(codes)
+                return result.rowcount
+            except Exception as e:
+                print(f"Error deleting {len(codes)} codes in the database: {e}")
+                db.session.rollback()
+                return 0
 
-    def delete_expired_codes(self, expired_codes):
+    # delete every code whose expiry has passed, for codes that expired while the app was not running
+    def purge_expired_codes(self):
         with self.app.app_context():
-            for code in expired_codes:
-                code_obj = CodeTable.query.filter_by(code=code).first()
-                if code_obj:
-                    try:
-                        self.db.session.delete(code_obj)
-                        self.db.session.commit()
-                    except Exception as e:
-                        print(f"Error deleting code {code} in the database: {e}")
-                        self.db.session.rollback()
+            try:
+                expired_codes = [code for (code,) in db.session.query(CodeTable.code).filter(CodeTable.expires_at <= datetime.datetime.now())]
+            except Exception as e:
+                print(f"Error querying database to get expired codes: {e}")
+                return 0
+        return self.delete_expired_codes(expired_codes)
+
+    def delete_expired_codes(self, expired_codes):
+        deleted = self.delete_codes(expired_codes)
+        print(f"Deleted {deleted} expired codes from the database.")
+        return deleted
 
 
     def reset_database(self):
         with self.app.app_context():
-            db.session.query(CodeTable).delete()
-            # db.session.query(Registration).delete()
-            db.session.commit()
-            print("Database reset.")
+            try:
+                result = db.session.execute(delete(CodeTable))
+                # db.session.query(Registration).delete()
+                db.session.commit()
+                with self._codes_lock:
+                    self._valid_codes.clear()
+                print("Database reset.")
+                return result.rowcount
+            except Exception as e:
+                print(f"Error resetting the database: {e}")
+                db.session.rollback()
+                return 0
     
 
     def is_new_day(self):
@@ -238,10 +337,29 @@ class WebServer:
             last_date = TodayDate.query.first()
             return last_date.router_password
 
+    # Returns the usage and checkout wait times of the database connection pool
+    def get_pool_stats(self):
+        with self.app.app_context():
+            return pool_stats(db.engine)
+
+    # Creates the tables, brings the schema up to date and loads the valid codes. Must run before the server is started
+    def prepare_database(self):
+        with self.app.app_context():
+            if is_sqlite(database_config):
+                enable_sqlite_wal(db.engine)
+            self.db.create_all()
+            migrate_schema(db.engine)
+            db.session.commit()
+            codes = {code for (code,) in db.session.query(CodeTable.code)}
+        with self._codes_lock:
+            self._valid_codes = codes
+
     def run(self):
-        self.server = serve(self.app, host='192.168.0.157', port=80)
-        # Add a signal handler for SIGTERM (termination signal)
-        signal.signal(signal.SIGTERM, self.shutdown)
+        self.server = create_server(self.app, host='192.168.0.157', port=80, threads=SERVER_THREADS)
+        self.listening.set()
+        # Add a signal handler for SIGTERM (termination signal). Signal handlers can only be set from the main thread
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda sig, frame: self.shutdown())
         # Start the server
         try:
             self.server.run()
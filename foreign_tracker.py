@@ -0,0 +1,76 @@
+import heapq
+import time
+
+# Tracks connected devices that are not using a code. Each device keeps the time it was first seen and its grace period
+# ends at a fixed deadline. Every snapshot is compared with the previous one, so only the devices that joined or left are
+# visited in Python. Devices that lose their code while connected are handed over with release. Finding the joined and
+# left devices is still one C-level set difference over the snapshot, the router only reports full client lists
+class ForeignUserTracker:
+    __slots__ = ("_grace_period", "_first_seen", "_deadlines", "_connected")
+
+    def __init__(self, grace_period):
+        self._grace_period = grace_period # seconds a foreign device may stay connected before it is blocked
+        self._first_seen = dict() # a dictionary of foreign mac addresses and the time they were first seen
+        self._deadlines = [] # a min-heap of (grace period end, mac address)
+        self._connected = None # the previous client snapshot, None before the first one
+
+    # Starts the grace period of a device, first seen at the given time
+    def _track(self, mac_address, first_seen):
+        self._first_seen[mac_address] = first_seen
+        heapq.heappush(self._deadlines, (first_seen + self._grace_period, mac_address))
+
+    # Tracks devices with the time they were first seen in an earlier run, so their grace periods keep their deadlines
+    def restore(self, first_seen):
+        for mac_address, seen_at in first_seen.items():
+            self._track(mac_address, seen_at)
+
+    # Stop tracking a device, used when it starts using a code
+    def discard(self, mac_address):
+        self._first_seen.pop(mac_address, None)
+
+    # Starts the grace period of devices that stopped using a code while they are connected
+    def release(self, devices, timed_users):
+        if self._connected is None:
+            return
+        now = time.time()
+        for mac_address in devices:
+            if mac_address in self._connected and mac_address not in timed_users and mac_address not in self._first_seen:
+                self._track(mac_address, now)
+
+    # Applies a new client snapshot and returns the devices whose grace period has run out
+    def update(self, connected_users, timed_users):
+        now = time.time()
+        if self._connected is None:
+            # first snapshot: every device is new, and restored devices that are gone are dropped
+            joined = connected_users
+            for mac_address in self._first_seen.keys() - connected_users:
+                del self._first_seen[mac_address]
+        else:
+            joined = connected_users - self._connected
+            for mac_address in self._connected - connected_users:
+                self._first_seen.pop(mac_address, None)
+        self._connected = connected_users
+
+        for mac_address in joined:
+            if mac_address not in timed_users and mac_address not in self._first_seen:
+                self._track(mac_address, now)
+
+        expired_users = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, mac_address = heapq.heappop(self._deadlines)
+            # skip entries of devices that left since they were pushed
+            first_seen = self._first_seen.get(mac_address)
+            if first_seen is None or first_seen + self._grace_period != deadline:
+                continue
+            expired_users.append(mac_address)
+            # a device that is still connected after being blocked gets a new grace period
+            self._track(mac_address, now)
+        return expired_users
+
+    # Returns a copy of the tracked devices and the time they were first seen
+    @property
+    def first_seen(self):
+        return dict(self._first_seen)
+
+    def __len__(self):
+        return len(self._first_seen)
@@ -0,0 +1,73 @@
+import re
+import threading
+
+MAC_CACHE_SIZE = 4096 # parsed mac addresses and formats kept, far more than the devices a router serves
+
+_NON_HEX = re.compile(r'[^0-9A-Fa-f]+')
+
+# A mac address stored as its 48-bit value. It hashes and compares like an int, so sets of connected, timed and foreign
+# devices are compared without string work. The router's formats are built once per address and cached
+class MacAddress(int):
+    __slots__ = ()
+
+    def __new__(cls, value):
+        value = int(value)
+        if not 0 <= value < 1 << 48:
+            raise ValueError(f"Not a 48-bit mac address: {value}")
+        return super().__new__(cls, value)
+
+    # Returns the router's display format, AA-BB-CC-DD-EE-FF
+    @property
+    def display(self):
+        return _formats(self)[0]
+
+    # Returns the format the router uses in element ids, AABBCCDDEEFF
+    @property
+    def compact(self):
+        return _formats(self)[1]
+
+    # every parsed mac address counts as present, including 00-00-00-00-00-00
+    def __bool__(self):
+        return True
+
+    def __str__(self):
+        return self.display
+
+    def __repr__(self):
+        return self.display
+
+
+_cache_lock = threading.Lock()
+_parsed = dict() # a dictionary of mac address text and the parsed mac address
+_formatted = dict() # a dictionary of mac address values and their (display, compact) formats
+
+def _formats(mac_address):
+    formats = _formatted.get(mac_address)
+    if formats is None:
+        compact = f"{int(mac_address):012X}"
+        formats = ('-'.join(compact[i:i + 2] for i in range(0, 12, 2)), compact)
+        with _cache_lock:
+            if len(_formatted) >= MAC_CACHE_SIZE:
+                _formatted.clear()
+            _formatted[int(mac_address)] = formats
+    return formats
+
+# Returns the mac address in any of the usual text formats as a MacAddress, or None if it is not a valid mac address
+def parse_mac(mac_address):
+    if isinstance(mac_address, MacAddress):
+        return mac_address
+    if not mac_address or not isinstance(mac_address, str):
+        return None
+    parsed = _parsed.get(mac_address)
+    if parsed is not None:
+        return parsed
+    digits = _NON_HEX.sub('', mac_address)
+    # anything other than hex digits and separators is not a mac address
+    if len(digits) != 12 or re.search(r'[^0-9A-Fa-f\s:.\-_]', mac_address):
+        return None
+    parsed = MacAddress(int(digits, 16))
+    with _cache_lock:
+        if len(_parsed) >= MAC_CACHE_SIZE:
+            _parsed.clear()
+        _parsed[mac_address] = parsed
+    return parsed
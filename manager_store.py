@@ -0,0 +1,175 @@
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+STATE_DIR = "state" # folder the code manager's state is kept in between runs
+SNAPSHOT_FILE = "manager_snapshot.json"
+JOURNAL_FILE = "manager_journal.{}.log" # one journal per generation, filled with the number of the generation
+SNAPSHOT_VERSION = 2
+SNAPSHOT_INTERVAL = 60 # seconds between snapshots, the journal covers the changes in between
+
+_JOURNAL_NAME = re.compile(r"^manager_journal\.(\d+)\.log$")
+
+
+# Raised when the snapshot or the journal can't be read back as written
+class StateCorrupted(Exception):
+    pass
+
+
+# Saves the code manager's state as a snapshot plus append-only journals of the binds and deletes made since that snapshot.
+# Every record carries a checksum so damaged files are detected instead of restoring the wrong state.
+# Records are queued with append, which is cheap enough to call under the manager's lock so they keep the order of the
+# changes, and written to disk by flush after the lock is released. Each snapshot starts a new journal generation, so
+# records made after a snapshot was taken are never removed along with the journals it replaces
+class ManagerStore:
+
+    def __init__(self, directory=STATE_DIR):
+        self._directory = directory
+        self._snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self._lock = threading.Lock() # guards the queued records and the generation
+        self._io_lock = threading.Lock() # one writer of the files at a time
+        self._pending = [] # a list of (generation, record) not written yet
+        self._generation = 0 # generation new records are journaled under
+        self._saved_generation = 0 # generation of the newest snapshot on disk
+        self._journals = dict() # a dictionary of generations and their open journal file
+
+    def _encode(self, record):
+        text = json.dumps(record, separators=(",", ":"))
+        return f"{zlib.crc32(text.encode()):08x} {text}"
+
+    def _decode(self, line):
+        checksum, _, text = line.partition(" ")
+        if not text or f"{zlib.crc32(text.encode()):08x}" != checksum:
+            raise StateCorrupted(f"Bad checksum in {line[:40]!r}")
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise StateCorrupted(f"Unreadable record {line[:40]!r}: {e}")
+
+    def _journal_path(self, generation):
+        return os.path.join(self._directory, JOURNAL_FILE.format(generation))
+
+    # Returns the generations of the journals on disk, oldest first
+    def _journal_generations(self):
+        if not os.path.isdir(self._directory):
+            return []
+        generations = []
+        for name in os.listdir(self._directory):
+            match = _JOURNAL_NAME.match(name)
+            if match:
+                generations.append(int(match.group(1)))
+        return sorted(generations)
+
+    # Queues a record for the journal. Call flush to write it
+    def append(self, record):
+        with self._lock:
+            self._pending.append((self._generation, record))
+
+    # Writes the queued records and makes sure they reached the disk
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            os.makedirs(self._directory, exist_ok=True)
+            written = dict()
+            for generation, record in pending:
+                journal = self._journals.get(generation)
+                if journal is None:
+                    journal = open(self._journal_path(generation), "a", encoding="utf-8")
+                    self._journals[generation] = journal
+                journal.write(self._encode(record) + "\n")
+                written[generation] = journal
+            for journal in written.values():
+                journal.flush()
+                os.fsync(journal.fileno())
+
+    # Starts a new journal generation and returns it. Call it while the state being snapshotted can't change, the records
+    # queued before it are in that state
+    def start_snapshot(self):
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    # Writes the snapshot of the given generation and removes the journals it replaces. The snapshot is written to a
+    # temporary file and renamed over the old one, so a crash leaves either the old snapshot and its journals or the new one
+    def write_snapshot(self, state, generation):
+        # the older journals stay readable if this snapshot doesn't make it to the disk
+        self.flush()
+        with self._io_lock:
+            # a snapshot taken earlier but written later must not replace a newer one
+            if generation <= self._saved_generation:
+                return
+            os.makedirs(self._directory, exist_ok=True)
+            temporary_path = self._snapshot_path + ".tmp"
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.write(self._encode({"version": SNAPSHOT_VERSION, "generation": generation, "saved_at": time.time(), "state": state}))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, self._snapshot_path)
+            self._saved_generation = generation
+            for old_generation in self._journal_generations():
+                if old_generation < generation:
+                    self._close_journal(old_generation)
+                    os.remove(self._journal_path(old_generation))
+
+    # Returns (time the snapshot was saved, snapshot state, journal records) or None when nothing was saved.
+    # Raises StateCorrupted if a file can't be read back and OSError if it can't be read at all
+    def load(self):
+        with self._io_lock:
+            has_snapshot = os.path.exists(self._snapshot_path)
+            generations = self._journal_generations()
+            if not has_snapshot and not generations:
+                return None
+
+            saved_at, state, snapshot_generation = None, dict(), 0
+            if has_snapshot:
+                with open(self._snapshot_path, encoding="utf-8") as file:
+                    snapshot = self._decode(file.read())
+                if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+                    raise StateCorrupted("Unknown snapshot version")
+                saved_at, state, snapshot_generation = snapshot["saved_at"], snapshot["state"], snapshot["generation"]
+
+            records = []
+            for generation in generations:
+                # journals older than the snapshot are already in it
+                if generation < snapshot_generation:
+                    continue
+                with open(self._journal_path(generation), encoding="utf-8") as file:
+                    lines = file.read().split("\n")
+                # only the last record can be missing its newline, when the process died while writing it
+                if lines.pop():
+                    print(f"Ignoring the unfinished last record of journal {generation}.")
+                records.extend(self._decode(line) for line in lines)
+
+            with self._lock:
+                self._generation = max([snapshot_generation] + generations)
+            self._saved_generation = snapshot_generation
+            return saved_at, state, records
+
+    def _close_journal(self, generation):
+        journal = self._journals.pop(generation, None)
+        if journal is not None:
+            journal.close()
+
+    # Removes the saved state, used when a new day starts with an empty code table or the saved state is damaged
+    def clear(self):
+        with self._io_lock:
+            with self._lock:
+                self._pending = []
+            for generation in list(self._journals):
+                self._close_journal(generation)
+            for generation in self._journal_generations():
+                os.remove(self._journal_path(generation))
+            if os.path.exists(self._snapshot_path):
+                os.remove(self._snapshot_path)
+            self._saved_generation = 0
+
+    def close(self):
+        with self._io_lock:
+            for generation in list(self._journals):
+                self._close_journal(generation)
@@ -0,0 +1,111 @@
+import heapq
+import itertools
+import threading
+import traceback
+from concurrent.futures import Future
+
+# command priorities, lower runs first
+PRIORITY_LOOKUP = 0 # mac lookups for fresh submissions
+PRIORITY_ADMIN = 1 # operations started from the UI
+PRIORITY_POLL = 2 # periodic client polls
+PRIORITY_BLOCKLIST = 3 # block batches and blocklist reconciliation
+
+
+# A pending router command. Commands with the same key are merged while they wait in the queue
+class RouterCommand:
+    def __init__(self, priority, key, function, args):
+        self.priority = priority
+        self.key = key
+        self.function = function
+        self.args = args
+        self.future = Future()
+
+
+# Owns the router and runs every router operation on a single thread, taking commands from a priority queue.
+# Callers get a future back and duplicate pending commands share the same future
+class RouterActor:
+
+    def __init__(self, router=None):
+        self._router = router
+        self._queue = [] # a min-heap of (priority, sequence, command)
+        self._pending = dict() # a dictionary of command keys and the command waiting in the queue
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    # Starts running commands. The router can be given here when it is created after the actor, commands submitted before
+    # that wait in the queue
+    def start(self, router=None):
+        if router is not None:
+            self._router = router
+        self._thread.start()
+
+    # Stops the actor once the commands already queued have run
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+
+    # Queues function(router, *args). A pending command with the same key is reused instead, moved up if the new priority
+    # is higher and updated with merge(pending_args) when given. Returns the command's future
+    def submit(self, priority, key, function, *args, merge=None):
+        with self._condition:
+            command = self._pending.get(key)
+            if command is not None:
+                if merge is not None:
+                    merge(command.args)
+                if priority < command.priority:
+                    command.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._sequence), command))
+                    self._condition.notify()
+                return command.future
+
+            command = RouterCommand(priority, key, function, list(args))
+            self._pending[key] = command
+            heapq.heappush(self._queue, (priority, next(self._sequence), command))
+            self._condition.notify()
+            return command.future
+
+    # Returns the next command to run or None when the actor is stopped
+    def _next_command(self):
+        with self._condition:
+            while True:
+                while self._queue:
+                    _, _, command = heapq.heappop(self._queue)
+                    # skip the older entry of a command that was moved up
+                    if self._pending.get(command.key) is command:
+                        del self._pending[command.key]
+                        return command
+                if not self._running:
+                    return None
+                self._condition.wait()
+
+    def _run(self):
+        while True:
+            command = self._next_command()
+            if command is None:
+                break
+            if not command.future.set_running_or_notify_cancel():
+                continue
+            try:
+                command.future.set_result(command.function(self._router, *command.args))
+            except Exception as e:
+                print(f"Error in router command {command.key}: {e}")
+                traceback.print_exc()
+                command.future.set_exception(e)
+
+    # Reads the connected clients. Lookups and polls share the same read
+    def get_connected_clients(self, priority=PRIORITY_POLL):
+        return self.submit(priority, "clients", lambda router: router.get_connected_clients())
+
+    # Runs a blocklist reconciliation. A waiting reconciliation also does the resync if any caller asked for one
+    def reconcile(self, blocklist, resync=False):
+        def merge(args):
+            args[1] = args[1] or resync
+        return self.submit(PRIORITY_BLOCKLIST, "reconcile", lambda router, blocklist, resync: blocklist.reconcile(resync=resync), blocklist, resync, merge=merge)
+
+    # Runs any other operation on the router with the given key
+    def call(self, key, function, priority=PRIORITY_ADMIN):
+        return self.submit(priority, key, function)
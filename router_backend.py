@@ -0,0 +1,80 @@
+from mac_address import parse_mac
+
+ROUTER_URL = "http://192.168.0.1"
+TIME_OUT_DURATION = 10
+ADMIN_MACS = (
+    "04-ED-33-CE-C5-43",
+) # devices that are never timed or blocked, add every admin device here
+ADMIN_ALLOWLIST = frozenset(parse_mac(mac_address) for mac_address in ADMIN_MACS)
+
+
+# router_backend interface. Every way of talking to the router (browser scraping, direct HTTP) implements these operations
+class RouterBackend:
+
+    # Sign in to the router's admin interface
+    def login(self):
+        pass
+
+    # Returns a list of the connected clients as dictionaries with "mac", "ip", "hostname" and "type" keys
+    def get_connected_clients(self):
+        pass
+
+    # Returns a set of mac addresses of all connected clients except the admin devices, or None if the clients could not be read
+    def get_all_connected_devices(self):
+        pass
+
+    # Returns the mac address of the client using the ip address, or None if it is not connected
+    def get_one_connected_device(self, ip_address):
+        pass
+
+    # Adds a device to the router's blocklist
+    def block_device(self, device):
+        pass
+
+    # Adds several devices to the router's blocklist. Returns a dictionary of each device and whether it was blocked
+    def block_devices(self, devices):
+        return {device: bool(self.block_device(device)) for device in devices}
+
+    # Removes a device from the router's blocklist
+    def unblock_device(self, device):
+        pass
+
+    # Removes several devices from the router's blocklist. Returns a dictionary of each device and True if it was unblocked,
+    # False if unblocking failed or None if it was not in the blocklist
+    def unblock_devices(self, devices):
+        return {device: bool(self.unblock_device(device)) for device in devices}
+
+    # Removes every device from the router's blocklist. Returns True if the blocklist is empty afterwards
+    def unblock_all_devices(self):
+        pass
+
+    # Returns a set of mac addresses currently in the router's blocklist, or None if the blocklist could not be read
+    def get_blocked_devices(self):
+        pass
+
+    # Change the router's password for the guest network. Returns True on success
+    def change_router_password(self, new_password):
+        pass
+
+    # Keeps the admin session from expiring while the router is idle. Called periodically from the tick
+    def keep_alive(self):
+        pass
+
+    # Returns the backend's metrics
+    def get_stats(self):
+        return dict()
+
+    # Release any resources held by the backend
+    def quit(self):
+        pass
+
+
+# Creates the router backend by name. Imports are done here so a backend's dependencies are only needed when it is used
+def create_router(backend="selenium"):
+    if backend == "http":
+        from router_http import HttpRouter
+        return HttpRouter()
+    elif backend == "selenium":
+        from router_device import Router
+        return Router()
+    raise ValueError(f"Unknown router backend: {backend}")
@@ -1,4 +1,5 @@
-import re
+import os
+import threading
 import time
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
@@ -10,73 +11,192 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from config import router_password
+from router_backend import RouterBackend, ROUTER_URL, TIME_OUT_DURATION, ADMIN_ALLOWLIST
+from mac_address import parse_mac
 
-ROUTER_LOGIN_PAGE = "http://192.168.0.1/webpages/index.html?t=29dee038"
-NETWORK_MAP_PAGE = "http://192.168.0.1/webpages/index.html?t=29dee038#networkMap"
-BLOCKLIST_PAGE = "http://192.168.0.1/webpages/index.html?t=29dee038#accessControl"
-WIFI_SETTINGS_PAGE = "http://192.168.0.1/webpages/index.html?t=29dee038#guestNetworkAdv"
-TIME_OUT_DURATION = 10
-ADMIN_MAC = "04-ED-33-CE-C5-43"
+ROUTER_LOGIN_PAGE = f"{ROUTER_URL}/webpages/index.html?t=29dee038"
+NETWORK_MAP_PAGE = f"{ROUTER_URL}/webpages/index.html?t=29dee038#networkMap"
+BLOCKLIST_PAGE = f"{ROUTER_URL}/webpages/index.html?t=29dee038#accessControl"
+WIFI_SETTINGS_PAGE = f"{ROUTER_URL}/webpages/index.html?t=29dee038#guestNetworkAdv"
+CHROME_PROFILE_DIR = "chrome_profile" # reused between runs so the router's session cookie survives restarts
+CHROME_WINDOW_SIZE = "1366,768"
+KEEP_ALIVE_INTERVAL = 5 * 60 # seconds the browser can sit idle before the session is refreshed
+WIFI_PASSWORD_INPUT = "#wpa-cfg-content input"
+WIFI_SAVE_BUTTON = '//*[@id="save-data"]/div[2]/div[1]/a'
+BLOCK_CONFIRM_BUTTON = '//*[@id="block-confirm-msg-btn-ok"]/div[2]/div[1]/a'
+BLOCKLIST_EMPTY_ROW = '#grid-blacklist-panel tr.empty' # the row the blocklist grid shows when it has no entries
 
-class Router:
+# collects every row of the client grid as {mac, ip, hostname, type} in one pass over the DOM
+CLIENT_GRID_SCRIPT = """
+const text = (row, selector) => {
+    const element = row.querySelector(selector);
+    return element ? element.textContent.trim() : null;
+};
+const rows = [];
+document.querySelectorAll('tr[id^="connected-clients-grid_tr_"]').forEach(row => {
+    rows.push({
+        mac: text(row, 'td.s-hide div.mac'),
+        ip: text(row, 'td.s-hide div.ip'),
+        hostname: text(row, 'div.name') || text(row, 'td.s-hide div.text'),
+        type: text(row, 'div.type') || text(row, 'span.connection-type')
+    });
+});
+return rows;
+"""
+
+# sets an input's value and fires the events the router's page listens for, so it shows the save button
+SET_INPUT_SCRIPT = """
+const input = arguments[0];
+input.value = arguments[1];
+input.dispatchEvent(new Event('input', {bubbles: true}));
+input.dispatchEvent(new Event('change', {bubbles: true}));
+"""
+
+# whether a request the page started at or after arguments[0] (a performance.now() time) has received its response
+REQUEST_DONE_SCRIPT = """
+return performance.getEntriesByType('resource').some(entry =>
+    (entry.initiatorType === 'xmlhttprequest' || entry.initiatorType === 'fetch')
+    && entry.startTime >= arguments[0] && entry.responseEnd > 0);
+"""
+
+# Router backend that drives the router's web interface through a headless Chrome session
+class Router(RouterBackend):
 
     def __init__(self):
         self._chrome_options = webdriver.ChromeOptions()
         self._chrome_options.add_argument("--headless")
         # self._chrome_options.add_argument('--no-sandbox')
-        self._chrome_options.add_experimental_option("detach", True)
+        # return from get() once the DOM is ready, the waits below look for the elements they need
+        self._chrome_options.page_load_strategy = "eager"
+        self._chrome_options.add_argument(f"--user-data-dir={os.path.abspath(CHROME_PROFILE_DIR)}")
+        self._chrome_options.add_argument(f"--window-size={CHROME_WINDOW_SIZE}")
+        # the admin pages are only read, so skip everything that isn't needed to find the elements
+        self._chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        self._chrome_options.add_argument("--disable-remote-fonts")
+        self._chrome_options.add_argument("--disable-extensions")
+        self._chrome_options.add_argument("--disable-gpu")
+        self._chrome_options.add_argument("--disable-dev-shm-usage")
+        self._chrome_options.add_argument("--disable-background-networking")
+        self._chrome_options.add_argument("--disable-component-update")
+        self._chrome_options.add_argument("--disable-sync")
+        self._chrome_options.add_argument("--no-first-run")
+        self._chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        })
         self._browser = webdriver.Chrome(options=self._chrome_options)
-        self._browser.maximize_window()
-        self._browser.get(ROUTER_LOGIN_PAGE)
 
+        self._stats_lock = threading.Lock()
+        self._page_loads = dict() # a dictionary of pages and their load count, total, last and longest load time in seconds
+        self._logins = 0 # times the password form was submitted
+        self._reused_sessions = 0 # times a saved session was still signed in
+        self._last_activity = time.monotonic()
+
+    # Loads a page and records how long it took
+    def _load_page(self, page_url):
+        started = time.monotonic()
+        self._browser.get(page_url)
+        duration = time.monotonic() - started
+        self._last_activity = time.monotonic()
+        page = page_url.rsplit("#", 1)[-1] if "#" in page_url else "index"
+        with self._stats_lock:
+            count, total, last, longest = self._page_loads.get(page, (0, 0.0, 0.0, 0.0))
+            self._page_loads[page] = (count + 1, total + duration, duration, max(longest, duration))
+
+    # Returns whether the router shows its login form, waiting for the page to show either the form or the network map
+    def _needs_login(self):
+        WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.any_of(
+            EC.visibility_of_element_located((By.ID, "local-login-pwd")),
+            EC.presence_of_element_located((By.ID, "map-clients"))))
+        return bool(self._browser.find_elements(By.ID, "local-login-pwd")) and self._browser.find_element(By.ID, "local-login-pwd").is_displayed()
+
+    # Signs in, unless the session saved in the browser profile is still valid
     def login(self):
+        self._load_page(NETWORK_MAP_PAGE)
+        if not self._needs_login():
+            print("Router session is still signed in, skipping login.")
+            with self._stats_lock:
+                self._reused_sessions += 1
+            return
+        self._submit_login()
+
+    def _submit_login(self):
         WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.ID, "local-login-pwd")))
         password_field = self._browser.find_elements(By.CSS_SELECTOR, '#local-login-pwd > div.widget-wrap-outer.text-wrap-outer.password-wrap-outer.allow-visible > div.widget-wrap.text-wrap.password-wrap > span.text-wrap-inner.password-wrap > input.text-text.password-text.password-hidden')[0]
         password_field.send_keys(router_password)
         password_field.send_keys(Keys.RETURN)
+        # logged in once the login form is gone
+        WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.invisibility_of_element_located((By.ID, "local-login-pwd")))
+        self._last_activity = time.monotonic()
+        with self._stats_lock:
+            self._logins += 1
 
     def redirect_to_page(self, page_url):
         # attempt to go to the target page
         if self._browser.current_url != page_url:
             print(f"Browser not in {page_url} page, redirecting...")
-            self._browser.get(page_url)
+            self._load_page(page_url)
             # check if the browser is in the login page
             if self._browser.current_url == ROUTER_LOGIN_PAGE:
                 print(f"Browser needs login, signing in...")
-                self.login()
-                self._browser.get(page_url)
+                self._submit_login()
+                self._load_page(page_url)
 
-    def get_all_connected_devices(self):
+    # Reloads the current page when the browser has been idle for a while so the router doesn't end the session, and signs
+    # back in right away if it already did
+    def keep_alive(self):
+        if time.monotonic() - self._last_activity < KEEP_ALIVE_INTERVAL:
+            return
+        try:
+            print("Router session idle, refreshing...")
+            self._load_page(NETWORK_MAP_PAGE)
+            if self._needs_login():
+                print("Router session expired, signing in...")
+                self._submit_login()
+        except Exception as e:
+            print(f"Could not refresh the router session. Error: {e}")
+
+    # Returns the login counts and the load times of each page
+    def get_stats(self):
+        with self._stats_lock:
+            return {
+                "logins": self._logins,
+                "reused_sessions": self._reused_sessions,
+                "page_loads": {page: {"count": count, "average": total / count, "last": last, "max": longest}
+                               for page, (count, total, last, longest) in self._page_loads.items()},
+            }
+
+    # Opens the clients tab of the network map and waits for the client grid to be filled
+    def _open_client_grid(self):
         self.redirect_to_page(NETWORK_MAP_PAGE)
 
+        # wait for clients tab to load
+        clients_button = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.ID, "map-clients")))
+        if clients_button.is_enabled():
+            clients_button.click()
+
+        # wait for clients to load
+        WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.CLASS_NAME, "grid-content-data")))
+        WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_all_elements_located((By.XPATH, '//td[contains(@class, "s-hide")]//div[@class="mac"]')))
+
+    # Reads the whole client grid in a single script call instead of one WebDriver round trip per element
+    def get_connected_clients(self):
+        self._open_client_grid()
+        rows = self._browser.execute_script(CLIENT_GRID_SCRIPT) or []
+        clients = []
+        for row in rows:
+            mac_address = parse_mac(row.get("mac"))
+            if not mac_address:
+                print(f"Found invalid mac address: {row.get('mac')}, skipping...")
+                continue
+            clients.append({"mac": mac_address, "ip": row.get("ip"), "hostname": row.get("hostname"), "type": row.get("type")})
+        return clients
+
+    def get_all_connected_devices(self):
         try:
-            # wait for clients tab to load
-            WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.ID, "map-clients")))
-            clients_button = self._browser.find_element(By.ID, "map-clients")
-            if clients_button.is_enabled():
-                clients_button.click()
-
-            # wait for clients to load
-            WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.CLASS_NAME, "grid-content-data")))
-            WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_all_elements_located((By.XPATH, '//td[contains(@class, "s-hide")]//div[@class="mac"]')))
-        
-            # time.sleep(1)
-            mac_elements = self._browser.find_elements(By.XPATH, '//td[contains(@class, "s-hide")]//div[@class="mac"]')
-            print(f"Devices connected: {len(mac_elements)}")
-
-            # compile mac addresses to a set
-            users = set()
-            for mac_element in mac_elements:
-                outer_html = mac_element.get_attribute('outerHTML')
-                mac_address = re.search(r'(?<=<div class="mac">)[\w\d-]+(?=</div>)', outer_html)
-                if mac_address:
-                    mac_address = mac_address.group(0).strip()
-                    if not mac_address:
-                        print(f"Found empty mac address: {mac_address}, skipping...")
-                    else:
-                        if mac_address != ADMIN_MAC:
-                            users.add(mac_address)
-            return users
+            clients = self.get_connected_clients()
+            print(f"Devices connected: {len(clients)}")
+            return {client["mac"] for client in clients} - ADMIN_ALLOWLIST
         except Exception as e:
             print(f"Could not find any connected devices. Error: {e}")
             # self.login()
@@ -84,145 +204,201 @@ class Router:
 
     # Get a connected device's mac address
     def get_one_connected_device(self, ip_address):
-        # check if the browser is in the networkmap page
-        self.redirect_to_page(NETWORK_MAP_PAGE)
-
         try:
-            # wait for clients tab to load
-            WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.ID, "map-clients")))
-            clients_button = self._browser.find_element(By.ID, "map-clients")
-            if clients_button.is_enabled():
-                clients_button.click()
-
-            # wait for clients to load
-            WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.CLASS_NAME, "grid-content-data")))
-            WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_all_elements_located((By.XPATH, '//td[contains(@class, "s-hide")]//div[@class="mac"]')))
-        
-            ip_elements = self._browser.find_elements(By.XPATH, '//td[contains(@class, "s-hide")]//div[@class="ip"]')
-
-            for ip in ip_elements:
-                ip_outer_html = ip.get_attribute('outerHTML')
-                ip_text = re.search(r'(?<=<div class="ip">)[\d.]+(?=</div>)', ip_outer_html).group(0).strip()
-                if ip_text:
-                    if ip_text == ip_address:
-                        mac_element = ip.find_element(By.XPATH, './preceding-sibling::div[@class="mac"]')
-                        mac_outer_html = mac_element.get_attribute('outerHTML')
-                        mac_address = re.search(r'(?<=<div class="mac">)[\w\d-]+(?=</div>)', mac_outer_html).group(0).strip()
-                        if mac_address:
-                            return mac_address
+            for client in self.get_connected_clients():
+                if client["ip"] == ip_address:
+                    return client["mac"]
 
             print(f"Could not find device with IP address: {ip_address}")
             return None
         except Exception as e:
             print(f"Error trying to find device with IP address: {ip_address}. Error: {e}")
-            return None   
+            return None
 
     # Block devices from the router
     def block_device(self, device):
-        self.redirect_to_page(NETWORK_MAP_PAGE)
+        return self.block_devices([device]).get(device, False)
 
+    # Block several devices in the same page session. Returns a dictionary of each device and whether it was blocked
+    def block_devices(self, devices):
+        results = {device: False for device in devices}
         try:
-            # wait for clients tab to load
-            clients_button = WebDriverWait(self._browser, TIME_OUT_DURATION).until(
-                EC.presence_of_element_located((By.ID, "map-clients")))
-            if clients_button.is_enabled():
-                clients_button.click()
+            self._open_client_grid()
         except Exception as e:
-            print(f"Could not find clients button. Error: {e}")
+            print(f"Could not open the clients grid. Error: {e}")
+            return results
 
-        # remove all non-alphanumeric characters from the string and strip white spaces
-        device = re.sub('[\W_]+', '', device)
-        device = device.strip()
-
-        # Check if the resulting string is empty
-        if not device:
-            print("Could not block device. Invalid MAC address.")
-        else:
+        for device in devices:
+            mac_address = parse_mac(device)
+            if mac_address is None:
+                print("Could not block device. Invalid MAC address.")
+                continue
+            # the grid rows are keyed by the mac address without separators
+            row_key = mac_address.compact
             try:
-                # wait for the block icon's td element to exist
-                td_element = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.ID, f'connected-clients-grid_tr_{device}_td_9')))
-                block_action_link = WebDriverWait(td_element, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.TAG_NAME, 'a')))
+                # the grid is already loaded so a missing row means the device is no longer connected
+                td_elements = self._browser.find_elements(By.ID, f'connected-clients-grid_tr_{row_key}_td_9')
+                if not td_elements:
+                    print(f"Device with MAC address {device} is not connected, skipping...")
+                    continue
+                block_action_link = WebDriverWait(td_elements[0], TIME_OUT_DURATION).until(EC.presence_of_element_located((By.TAG_NAME, 'a')))
                 # click the block button if it is enabled
                 if block_action_link.is_enabled():
-                    # block_action_link.click()
                     self._browser.execute_script("arguments[0].click();", block_action_link)
                     # confirm blocking the device
-                    confirm_block_button = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.XPATH, '//*[@id="block-confirm-msg-btn-ok"]/div[2]/div[1]/a')))
+                    confirm_block_button = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.XPATH, BLOCK_CONFIRM_BUTTON)))
                     if confirm_block_button.is_enabled():
                         confirm_block_button.click()
-                        print (f"Blocked device with MAC address: {device}")
+                        # wait for the dialog to close before moving to the next row
+                        WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.invisibility_of_element_located((By.XPATH, BLOCK_CONFIRM_BUTTON)))
+                        results[device] = True
+                        print(f"Blocked device with MAC address: {device}")
             except Exception as e:
                 print(f"An error occurred while trying to block the device with MAC address {device}: {e}")
-       
-    # Unblock all devices from the router
-    def unblock_all_devices(self):
+        return results
+
+    # Returns the unblock buttons of the blocklist grid mapped by the normalized mac address of their row. Raises if the
+    # blocklist doesn't load, so an empty result always means the grid showed its empty row
+    def _get_blocklist_buttons(self):
         self.redirect_to_page(BLOCKLIST_PAGE)
-        # wait for block list container to load
+        WebDriverWait(self._browser, TIME_OUT_DURATION-7).until(EC.presence_of_element_located((By.XPATH, '//*[@id="grid-blacklist-panel"]/div/div/div/div[4]')))
+        # the grid is filled once it shows either its entries or its empty row
+        WebDriverWait(self._browser, TIME_OUT_DURATION-7).until(EC.any_of(
+            EC.presence_of_element_located((By.CLASS_NAME, 'btn-delete')),
+            EC.presence_of_element_located((By.CSS_SELECTOR, BLOCKLIST_EMPTY_ROW))))
+        return self._read_blocklist_buttons()
+
+    # Returns the unblock buttons currently in the blocklist grid without waiting for it
+    def _read_blocklist_buttons(self):
+        buttons = {}
+        for button in self._browser.find_elements(By.CLASS_NAME, 'btn-delete'):
+            mac_address = parse_mac(button.find_element(By.XPATH, '..').get_attribute('data-key'))
+            if mac_address:
+                buttons[mac_address] = button
+        return buttons
+
+    # Get the mac addresses currently in the blocklist
+    def get_blocked_devices(self):
         try:
-            WebDriverWait(self._browser, TIME_OUT_DURATION-7).until(EC.presence_of_element_located((By.XPATH, '//*[@id="grid-blacklist-panel"]/div/div/div/div[4]')))
-            # wait for all the unblock all button to appear
-            WebDriverWait(self._browser, TIME_OUT_DURATION-7).until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'btn-delete')))
-        except:
-            print("No devices to unblock.")
+            return set(self._get_blocklist_buttons())
+        except Exception as e:
+            print(f"An error occurred while trying to read the blocklist: {e}")
             return None
+
+    # Unblock a single device from the router
+    def unblock_device(self, device):
+        return self.unblock_devices([device]).get(device, False)
+
+    # Unblock several devices from one load of the blocklist page. Returns a dictionary of each device and True if it was
+    # unblocked, False if unblocking failed or None if it was not in the blocklist
+    def unblock_devices(self, devices):
+        results = {device: False for device in devices}
         try:
-            device_unblock_buttons = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'btn-delete')))
-            print(f"Devices currently blocked: {len(device_unblock_buttons)}")
-            # click all the unblock all buttons
-            for button in device_unblock_buttons:
+            buttons = self._get_blocklist_buttons()
+        except Exception as e:
+            print(f"Could not open the blocklist. Error: {e}")
+            return results
+
+        not_found = []
+        for device in devices:
+            button = buttons.get(parse_mac(device))
+            if button is None:
+                results[device] = None
+                not_found.append(device)
+                continue
+            try:
                 if button.is_enabled():
-                    parent_div = button.find_element(By.XPATH, '..')
-                    # get the value of the "data-key" attribute of the parent "div" element
-                    data_key_value = parent_div.get_attribute('data-key')
                     button.click()
-                    print(f"Unblocking device with MAC address: {data_key_value}")
-                time.sleep(2)
+                    # the grid is redrawn once the router has removed the entry
+                    WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.staleness_of(button))
+                    results[device] = True
+                    print(f"Unblocked device with MAC address: {device}")
+            except Exception as e:
+                print(f"An error occurred while trying to unblock the device with MAC address {device}: {e}")
+            # the redrawn grid has new buttons, read them from the page that is already loaded
+            buttons = self._read_blocklist_buttons()
+        if not_found:
+            print(f"Devices not in the blocklist: {', '.join(str(device) for device in not_found)}")
+        return results
+
+    # Unblock all devices from the router. Each entry is removed once the grid has been redrawn without it, then the
+    # blocklist is read again. Returns True if the blocklist was read and is empty, False if it could not be loaded
+    def unblock_all_devices(self):
+        try:
+            buttons = self._get_blocklist_buttons()
+        except Exception as e:
+            print(f"Could not open the blocklist, nothing was unblocked. Error: {e}")
+            return False
+        try:
+            if not buttons:
+                print("No devices to unblock.")
+                return True
+            print(f"Devices currently blocked: {len(buttons)}")
+            # every removal redraws the grid, so the buttons are looked up again after each one
+            for _ in range(len(buttons)):
+                if not buttons:
+                    break
+                mac_address, button = next(iter(buttons.items()))
+                button.click()
+                WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.staleness_of(button))
+                print(f"Unblocked device with MAC address: {mac_address}")
+                buttons = self._read_blocklist_buttons()
+
+            remaining = self._read_blocklist_buttons()
+            if remaining:
+                print(f"Devices still blocked after unblocking: {', '.join(mac_address.display for mac_address in remaining)}")
+                return False
+            return True
         except Exception as e:
             print(f"An error occurred while trying to unblock devices: {e}")
+            return False
 
-    # Change the router's password for the guest network
+    # Change the router's password for the guest network. Returns False if the change could not be submitted or the
+    # settings page shows a different password afterwards. Once the save is clicked the router may already have the new
+    # password, so a save response or a read back that doesn't come in time is only logged
     def change_router_password(self, new_password):
         self.redirect_to_page(NETWORK_MAP_PAGE)
         WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.ID, "map-clients")))
         self.redirect_to_page(WIFI_SETTINGS_PAGE)
         try:
-            WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.CSS_SELECTOR, "#wpa-cfg-content input")))
-            
-            password_input = self._browser.find_element(By.CSS_SELECTOR, "#wpa-cfg-content input")
-            self._browser.execute_script("arguments[0].scrollIntoView();", password_input)
-            
-            self._browser.execute_script("arguments[0].click();", password_input)
-            self._browser.execute_script("arguments[0].value = '';", password_input)
-            
-            # simulate a manual keypress by typing each character with a delay in between
-            action_chains = ActionChains(self._browser)
-            for char in new_password:
-                action_chains.send_keys(char)
-                self._browser.execute_script("arguments[0].click();", password_input)
-                # Trigger the input event so save button appears in headless mode
-                self._browser.execute_script("arguments[0].dispatchEvent(new Event('input'));", password_input)
-                self._browser.execute_script("arguments[0].dispatchEvent(new Event('change'));", password_input)
-                self._browser.execute_script("arguments[0].value = arguments[1];", password_input, new_password)
-                time.sleep(0.5)
-            action_chains.perform()
-            
-            self._browser.execute_script("arguments[0].value = '';", password_input)
-            self._browser.execute_script("arguments[0].value = arguments[1];", password_input, new_password)
-
-            
-            
-            save_button = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.XPATH, '//*[@id="save-data"]/div[2]/div[1]/a')))
-            if save_button.is_enabled():
-                # save_button.click()
-                self._browser.execute_script("arguments[0].click();", save_button)
-                print("Password changed successfully.")
-                return True
-            
-            return False
+            password_input = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.CSS_SELECTOR, WIFI_PASSWORD_INPUT)))
+            self._browser.execute_script("arguments[0].scrollIntoView(); arguments[0].focus(); arguments[0].value = '';", password_input)
+
+            # type the password into the focused input as key presses, then set the value with the input events the page
+            # needs in headless mode
+            ActionChains(self._browser).send_keys(new_password).perform()
+            self._browser.execute_script(SET_INPUT_SCRIPT, password_input, new_password)
+
+            # the save button is shown once the page has accepted the change
+            save_button = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.element_to_be_clickable((By.XPATH, WIFI_SAVE_BUTTON)))
+            clicked_at = self._browser.execute_script("return performance.now();")
+            self._browser.execute_script("arguments[0].click();", save_button)
         except Exception as e:
             print(f"An error occurred while trying to change the router password: {e}")
             return False
 
+        # the save is done once the request sent by the click has been answered
+        try:
+            WebDriverWait(self._browser, TIME_OUT_DURATION).until(lambda browser: browser.execute_script(REQUEST_DONE_SCRIPT, clicked_at))
+        except Exception as e:
+            print(f"No response to the password save request yet, checking the settings page. Error: {e}")
+
+        # read the setting back from a fresh page
+        try:
+            self._load_page(NETWORK_MAP_PAGE)
+            self._load_page(WIFI_SETTINGS_PAGE)
+            password_input = WebDriverWait(self._browser, TIME_OUT_DURATION).until(EC.presence_of_element_located((By.CSS_SELECTOR, WIFI_PASSWORD_INPUT)))
+            WebDriverWait(self._browser, TIME_OUT_DURATION).until(lambda browser: password_input.get_attribute("value"))
+            stored_password = password_input.get_attribute("value")
+        except Exception as e:
+            print(f"Could not read the password back after saving, assuming the router kept it. Error: {e}")
+            return True
+        if stored_password != new_password:
+            print("The router did not keep the new password.")
+            return False
+        print("Password changed successfully.")
+        return True
+
 
     # Quits the browser
     def quit(self):
@@ -0,0 +1,197 @@
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from config import router_password
+from router_backend import RouterBackend, ROUTER_URL, TIME_OUT_DURATION, ADMIN_ALLOWLIST
+from mac_address import parse_mac
+
+API_URL = f"{ROUTER_URL}/cgi-bin/luci/;stok={{token}}/{{path}}"
+KEYS_ENDPOINT = "login?form=keys"
+LOGIN_ENDPOINT = "login?form=login"
+CLIENTS_ENDPOINT = "admin/status?form=all"
+BLOCKLIST_ENDPOINT = "admin/access_control?form=black_devices"
+GUEST_NETWORK_ENDPOINT = "admin/wireless?form=guest"
+CLIENT_LISTS = {"access_devices_wired": "wired", "access_devices_wireless_host": "wireless", "access_devices_wireless_guest": "guest"}
+POOL_SIZE = 4
+
+
+# Raised when the router rejects a request because the session token is missing or expired
+class SessionExpired(Exception):
+    pass
+
+
+# Router backend that talks to the router's JSON endpoints directly over a pooled HTTP session, so no browser is needed
+class HttpRouter(RouterBackend):
+
+    def __init__(self):
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self._session.mount(ROUTER_URL, adapter)
+        self._session.headers.update({"Referer": f"{ROUTER_URL}/webpages/index.html", "X-Requested-With": "XMLHttpRequest"})
+        self._token = ""
+        self._login_lock = threading.Lock()
+
+    # Encrypts the password with the router's public key the same way the login page does
+    def _encrypt_password(self, modulus, exponent):
+        public_key = rsa.RSAPublicNumbers(int(exponent, 16), int(modulus, 16)).public_key()
+        return public_key.encrypt(router_password.encode(), padding.PKCS1v15()).hex()
+
+    # Sends a form to an endpoint and returns the "data" part of the router's reply
+    def _post(self, path, form, token=None):
+        url = API_URL.format(token=self._token if token is None else token, path=path)
+        response = self._session.post(url, data=form, timeout=TIME_OUT_DURATION)
+        if response.status_code in (401, 403):
+            raise SessionExpired(path)
+        response.raise_for_status()
+        reply = response.json()
+        if not reply.get("success"):
+            if reply.get("errorcode") in ("timeout", "login", "permission denied"):
+                raise SessionExpired(path)
+            raise RuntimeError(f"Router rejected {path}: {reply.get('errorcode')}")
+        return reply.get("data")
+
+    # Sends a request with the current token, logging in again once if the session has expired
+    def _request(self, path, form):
+        try:
+            return self._post(path, form)
+        except SessionExpired:
+            print("Router session expired, signing in...")
+            self.login()
+            return self._post(path, form)
+
+    def login(self):
+        with self._login_lock:
+            keys = self._post(KEYS_ENDPOINT, {"operation": "read"}, token="")
+            modulus, exponent = keys["password"]
+            data = self._post(LOGIN_ENDPOINT, {"operation": "login", "password": self._encrypt_password(modulus, exponent)}, token="")
+            self._token = data["stok"]
+            print("Signed in to the router.")
+
+    def get_connected_clients(self):
+        data = self._request(CLIENTS_ENDPOINT, {"operation": "read"})
+        clients = []
+        for list_name in CLIENT_LISTS:
+            for client in data.get(list_name) or []:
+                mac_address = parse_mac(client.get("macaddr"))
+                if mac_address:
+                    clients.append({"mac": mac_address, "ip": client.get("ipaddr"), "hostname": client.get("hostname"), "type": CLIENT_LISTS[list_name]})
+        return clients
+
+    def get_all_connected_devices(self):
+        try:
+            clients = self.get_connected_clients()
+            print(f"Devices connected: {len(clients)}")
+            return {client["mac"] for client in clients} - ADMIN_ALLOWLIST
+        except Exception as e:
+            print(f"Could not find any connected devices. Error: {e}")
+            return None
+
+    def get_one_connected_device(self, ip_address):
+        try:
+            for client in self.get_connected_clients():
+                if client["ip"] == ip_address:
+                    return client["mac"]
+            print(f"Could not find device with IP address: {ip_address}")
+            return None
+        except Exception as e:
+            print(f"Error trying to find device with IP address: {ip_address}. Error: {e}")
+            return None
+
+    # Returns the blocklist entries as reported by the router
+    def _get_blocklist(self):
+        return self._request(BLOCKLIST_ENDPOINT, {"operation": "load"}) or []
+
+    def get_blocked_devices(self):
+        try:
+            return {mac for mac in (parse_mac(entry.get("mac")) for entry in self._get_blocklist()) if mac}
+        except Exception as e:
+            print(f"An error occurred while trying to read the blocklist: {e}")
+            return None
+
+    def block_device(self, device):
+        mac_address = parse_mac(device)
+        if not mac_address:
+            print("Could not block device. Invalid MAC address.")
+            return False
+        try:
+            entry = json.dumps({"name": mac_address.display, "mac": mac_address.display})
+            self._request(BLOCKLIST_ENDPOINT, {"operation": "insert", "key": "add", "index": 0, "old": "add", "new": entry})
+            print(f"Blocked device with MAC address: {mac_address}")
+            return True
+        except Exception as e:
+            print(f"An error occurred while trying to block the device with MAC address {device}: {e}")
+            return False
+
+    def unblock_device(self, device):
+        return self.unblock_devices([device]).get(device, False)
+
+    # Removes every matching blocklist entry in a single request. Devices that were not in the blocklist are reported as None
+    def unblock_devices(self, devices):
+        results = {device: False for device in devices}
+        try:
+            wanted = {parse_mac(device): device for device in devices}
+            keys = []
+            indexes = []
+            found = []
+            for index, entry in enumerate(self._get_blocklist()):
+                mac_address = parse_mac(entry.get("mac"))
+                if mac_address in wanted:
+                    keys.append(entry.get("key", index))
+                    indexes.append(index)
+                    found.append(wanted[mac_address])
+            if keys:
+                self._request(BLOCKLIST_ENDPOINT, {"operation": "remove", "key": json.dumps(keys), "index": json.dumps(indexes)})
+                print(f"Unblocked {len(keys)} devices.")
+            results = {device: None for device in devices}
+            results.update({device: True for device in found})
+            not_found = [device for device in devices if results[device] is None]
+            if not_found:
+                print(f"Devices not in the blocklist: {', '.join(str(device) for device in not_found)}")
+            return results
+        except Exception as e:
+            print(f"An error occurred while trying to unblock devices: {e}")
+            return results
+
+    def unblock_all_devices(self):
+        try:
+            blocklist = self._get_blocklist()
+            if not blocklist:
+                print("No devices to unblock.")
+                return True
+            print(f"Devices currently blocked: {len(blocklist)}")
+            keys = json.dumps([entry.get("key", index) for index, entry in enumerate(blocklist)])
+            indexes = json.dumps(list(range(len(blocklist))))
+            self._request(BLOCKLIST_ENDPOINT, {"operation": "remove", "key": keys, "index": indexes})
+            remaining = self._get_blocklist()
+            if remaining:
+                print(f"Devices still blocked after unblocking: {len(remaining)}")
+                return False
+            return True
+        except Exception as e:
+            print(f"An error occurred while trying to unblock devices: {e}")
+            return False
+
+    def change_router_password(self, new_password):
+        try:
+            settings = self._request(GUEST_NETWORK_ENDPOINT, {"operation": "read"}) or {}
+            form = {key: new_password for key in settings if key.endswith("psk_key")}
+            if not form:
+                print("Could not find the guest network password settings.")
+                return False
+            form["operation"] = "write"
+            self._request(GUEST_NETWORK_ENDPOINT, form)
+            # read the setting back to make sure the router kept it
+            settings = self._request(GUEST_NETWORK_ENDPOINT, {"operation": "read"}) or {}
+            if any(settings.get(key) != new_password for key in form if key != "operation"):
+                print("The router did not keep the new password.")
+                return False
+            print("Password changed successfully.")
+            return True
+        except Exception as e:
+            print(f"An error occurred while trying to change the router password: {e}")
+            return False
+
+    def quit(self):
+        self._session.close()
@@ -1,48 +1,97 @@
 #class for populating the rows in the UI
 import customtkinter
 
+ROW_WINDOW = 100 # rows that have widgets at a time, the rest of the codes are reached with the page buttons
+
 class Rows:
 
     def __init__(self, inner_frame, label_width, delete_row_buton_event):
         self.inner_frame = inner_frame
         self.label_width = label_width
         self.delete_row_buton_event = delete_row_buton_event
+        self.first_row = 0 # index of the first code shown
+        self._entries = [] # the last rendered list of (key, status, users, time_remaining)
+        self._rows = dict() # a dictionary of codes and the widgets of their row
+        self._values = dict() # a dictionary of codes and the (status, users, time_remaining) shown in their row
+        self._grid_rows = dict() # a dictionary of codes and the grid row they are placed in
+        self._pager = None # widgets used to page through the codes, created when they are needed
+
+    # Renders the codes, creating rows for new codes, destroying rows of removed codes and reconfiguring only the cells that changed
+    def render(self, entries):
+        self._entries = entries
+        # keep the window on the last page if codes were removed
+        last_page_start = max(0, (len(entries) - 1) // ROW_WINDOW * ROW_WINDOW)
+        self.first_row = min(self.first_row, last_page_start)
+        visible = entries[self.first_row:self.first_row + ROW_WINDOW]
 
-    def group_children_to_rows(self, children):
-        rows = []
-        current_row = []
-        for i, child in enumerate(children):
-            if i > 0 and i % 5 == 0:
-                rows.append(current_row)
-                current_row = []
-            current_row.append(child)
+        visible_keys = {entry[0] for entry in visible}
+        for key in [key for key in self._rows if key not in visible_keys]:
+            self.delete_row(key)
 
-        if current_row:
-            rows.append(current_row)
+        for i, (key, status, users, time_remaining) in enumerate(visible):
+            grid_row = i + 1 # row 0 holds the headers
+            if key not in self._rows:
+                self.create_row(grid_row, key, status, users, time_remaining)
+                continue
+            self.update_row(key, status, users, time_remaining)
+            if self._grid_rows[key] != grid_row:
+                for widget in self._rows[key]:
+                    widget.grid(row=grid_row)
+                self._grid_rows[key] = grid_row
 
-        return rows
+        self.update_pager()
 
-    def update_row(self, row, key, status, users, time_remaining):
-        row[0].configure(text=key)
-        row[1].configure(text=status)
-        row[2].configure(text=users)
-        row[3].configure(text=time_remaining)
-        row[4].configure(command=lambda captured_code=key: self.delete_row_buton_event(captured_code))
+    def update_row(self, key, status, users, time_remaining):
+        row = self._rows[key]
+        old_values = self._values[key]
+        new_values = (status, users, time_remaining)
+        for column, (old_value, new_value) in enumerate(zip(old_values, new_values), start=1):
+            if old_value != new_value:
+                row[column].configure(text=new_value)
+        self._values[key] = new_values
 
     def create_row(self, row_num, key, status, users, time_remaining):
-        label = customtkinter.CTkLabel(self.inner_frame, text=key, width=self.label_width)
-        label.grid(row=row_num, column=0, padx=5, pady=5, sticky="nsew")
-        label = customtkinter.CTkLabel(self.inner_frame, text=status, width=self.label_width)
-        label.grid(row=row_num, column=1, padx=5, pady=5, sticky="nsew")
-        label = customtkinter.CTkLabel(self.inner_frame, text=users, width=self.label_width)
-        label.grid(row=row_num, column=2, padx=5, pady=5, sticky="nsew")
-        label = customtkinter.CTkLabel(self.inner_frame, text=time_remaining, width=self.label_width)
-        label.grid(row=row_num, column=3, padx=5, pady=5, sticky="nsew")
+        row = []
+        for column, text in enumerate((key, status, users, time_remaining)):
+            label = customtkinter.CTkLabel(self.inner_frame, text=text, width=self.label_width)
+            label.grid(row=row_num, column=column, padx=5, pady=5, sticky="nsew")
+            row.append(label)
         button = customtkinter.CTkButton(self.inner_frame, text="Delete", width=self.label_width-50, fg_color="#5a5a5a", command=lambda captured_code=key: self.delete_row_buton_event(captured_code))
         button.grid(row=row_num, column=4, padx=(40,0), pady=5, sticky="nsew")
+        row.append(button)
+        self._rows[key] = row
+        self._values[key] = (status, users, time_remaining)
+        self._grid_rows[key] = row_num
+
+    def delete_row(self, key):
+        for widget in self._rows.pop(key):
+            widget.destroy()
+        del self._values[key]
+        del self._grid_rows[key]
+
+    # Moves the window of rows by a page and renders it
+    def change_page(self, pages):
+        self.first_row = max(0, self.first_row + pages * ROW_WINDOW)
+        self.render(self._entries)
+
+    # Shows the page buttons when there are more codes than rows, below the last row
+    def update_pager(self):
+        if len(self._entries) <= ROW_WINDOW:
+            if self._pager is not None:
+                for widget in self._pager:
+                    widget.grid_remove()
+            return
+
+        if self._pager is None:
+            previous_button = customtkinter.CTkButton(self.inner_frame, text="Previous", width=self.label_width, command=lambda: self.change_page(-1))
+            page_label = customtkinter.CTkLabel(self.inner_frame, text="", width=self.label_width)
+            next_button = customtkinter.CTkButton(self.inner_frame, text="Next", width=self.label_width, command=lambda: self.change_page(1))
+            self._pager = (previous_button, page_label, next_button)
 
-    def delete_extra_rows(self, rows, num_codes):
-        if len(rows) > num_codes:
-            for i in range(num_codes, len(rows)):
-                for child in rows[i]:
-                    child.destroy()
\ No newline at end of file
+        previous_button, page_label, next_button = self._pager
+        last_shown = min(len(self._entries), self.first_row + ROW_WINDOW)
+        page_label.configure(text=f"{self.first_row + 1}-{last_shown} of {len(self._entries)}")
+        previous_button.configure(state="normal" if self.first_row > 0 else "disabled")
+        next_button.configure(state="normal" if last_shown < len(self._entries) else "disabled")
+        for column, widget in enumerate(self._pager, start=1):
+            widget.grid(row=ROW_WINDOW + 1, column=column, padx=5, pady=5, sticky="nsew")
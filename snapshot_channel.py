@@ -0,0 +1,61 @@
+import threading
+
+# Latest-value-wins channel between threads. Producers publish whole snapshots and the consumer only ever sees the newest one,
+# snapshots replaced before they were taken are dropped and counted
+class SnapshotChannel:
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._value = None
+        self._version = 0 # version of the newest published snapshot
+        self._taken_version = 0 # version of the last snapshot handed to the consumer
+        self._closed = False
+
+        # counters of the channel
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    # Publishes a snapshot, replacing one that hasn't been taken yet. Returns its version
+    def publish(self, value):
+        with self._condition:
+            if self._version > self._taken_version:
+                self.dropped += 1
+            self._version += 1
+            self._value = value
+            self.published += 1
+            self._condition.notify_all()
+            return self._version
+
+    # Returns (version, snapshot) if a newer snapshot was published since the last take, otherwise None
+    def take(self):
+        with self._condition:
+            return self._take()
+
+    def _take(self):
+        if self._version <= self._taken_version:
+            return None
+        self._taken_version = self._version
+        self.delivered += 1
+        value = self._value
+        self._value = None
+        return (self._version, value)
+
+    # Blocks until a newer snapshot is published and returns it. Returns None once the channel is closed
+    def wait(self, timeout=None):
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or self._version > self._taken_version, timeout)
+            if self._closed:
+                return None
+            return self._take()
+
+    # Wakes up the consumer and makes wait return None
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def stats(self):
+        with self._condition:
+            return {"version": self._version, "published": self.published, "delivered": self.delivered, "dropped": self.dropped}
@@ -0,0 +1,61 @@
+import threading
+import time
+import traceback
+
+# Runs the startup phases on their own threads and signals when each one is ready. Phases wait on the phases they need
+# instead of on a fixed delay, and the time each phase took is recorded
+class StartupPhases:
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._ready = dict() # a dictionary of phase names and the event set when the phase finished
+        self._timings = dict() # a dictionary of phase names and (seconds since startup began, seconds the phase took)
+        self._failed = set() # phases that raised, they are still marked ready so waiting phases don't hang
+
+    # Starts a phase. It runs once every phase in needs is ready
+    def start(self, name, function, needs=()):
+        with self._lock:
+            event = self._ready.setdefault(name, threading.Event())
+        thread = threading.Thread(target=self._run, args=(name, function, needs, event), daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, name, function, needs, event):
+        for need in needs:
+            self.wait(need)
+        started = time.monotonic()
+        try:
+            function()
+        except Exception as e:
+            print(f"Error in startup phase {name}: {e}")
+            traceback.print_exc()
+            with self._lock:
+                self._failed.add(name)
+        finished = time.monotonic()
+        with self._lock:
+            self._timings[name] = (finished - self._started, finished - started)
+        print(f"Startup phase {name} ready after {finished - self._started:.2f}s (took {finished - started:.2f}s)")
+        event.set()
+
+    # Waits for a phase to be ready. Returns False if the timeout passed first
+    def wait(self, name, timeout=None):
+        with self._lock:
+            event = self._ready.setdefault(name, threading.Event())
+        return event.wait(timeout)
+
+    def is_ready(self, name):
+        with self._lock:
+            event = self._ready.get(name)
+        return event is not None and event.is_set()
+
+    def failed(self, name):
+        with self._lock:
+            return name in self._failed
+
+    # Returns every finished phase with when it was ready and how long it took, in seconds
+    @property
+    def stats(self):
+        with self._lock:
+            return {name: {"ready_at": round(ready_at, 3), "duration": round(duration, 3), "failed": name in self._failed}
+                    for name, (ready_at, duration) in self._timings.items()}
@@ -0,0 +1,12 @@
+import time
+
+import pytest
+
+
+# A clock that only moves when a test moves it. Both time.time and time.monotonic read it
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
@@ -0,0 +1,111 @@
+from blocklist_reconciler import BlocklistReconciler
+
+BLOCK_DURATION = 60
+
+
+class FakeRouter:
+    def __init__(self, blocked=()):
+        self.blocked = set(blocked)
+        self.block_calls = []
+        self.unblock_calls = []
+
+    def get_blocked_devices(self):
+        return set(self.blocked)
+
+    def block_devices(self, devices):
+        self.block_calls.append(sorted(devices))
+        self.blocked.update(devices)
+        return {device: True for device in devices}
+
+    # like the router backends: devices that are not in the blocklist come back as None
+    def unblock_devices(self, devices):
+        self.unblock_calls.append(sorted(devices))
+        results = {device: (True if device in self.blocked else None) for device in devices}
+        self.blocked.difference_update(devices)
+        return results
+
+
+# a router whose blocklist page doesn't load until readable is set
+class UnreadableRouter(FakeRouter):
+    def __init__(self, blocked=()):
+        super().__init__(blocked)
+        self.readable = False
+
+    def get_blocked_devices(self):
+        return super().get_blocked_devices() if self.readable else None
+
+    def unblock_devices(self, devices):
+        if self.readable:
+            return super().unblock_devices(devices)
+        self.unblock_calls.append(sorted(devices))
+        return {device: False for device in devices}
+
+
+def test_only_the_differences_are_sent(clock):
+    router = FakeRouter()
+    reconciler = BlocklistReconciler(router, BLOCK_DURATION)
+    reconciler.block([1, 2])
+    assert reconciler.reconcile() == ([1, 2], [])
+    reconciler.block([2, 3])
+    assert reconciler.reconcile() == ([3], [])
+    assert router.block_calls == [[1, 2], [3]]
+
+
+def test_blocks_are_removed_when_they_expire(clock):
+    router = FakeRouter()
+    reconciler = BlocklistReconciler(router, BLOCK_DURATION)
+    reconciler.block([1])
+    reconciler.reconcile()
+    clock[0] += BLOCK_DURATION
+    assert reconciler.reconcile() == ([], [1])
+    assert router.blocked == set()
+
+
+def test_blocks_found_on_the_first_read_are_adopted(clock):
+    router = FakeRouter(blocked={7})
+    reconciler = BlocklistReconciler(router, BLOCK_DURATION)
+    assert reconciler.reconcile() == ([], [])
+    clock[0] += BLOCK_DURATION
+    assert reconciler.reconcile() == ([], [7])
+
+
+def test_devices_missing_from_the_router_are_dropped_without_counting_them(clock):
+    router = FakeRouter()
+    reconciler = BlocklistReconciler(router, BLOCK_DURATION)
+    reconciler.block([1])
+    reconciler.reconcile()
+    router.blocked.clear() # removed on the router by other means
+    clock[0] += BLOCK_DURATION
+    assert reconciler.reconcile() == ([], [])
+    # not retried on the next pass
+    assert reconciler.reconcile() == ([], [])
+    assert router.unblock_calls == [[1]]
+
+
+def test_blocks_are_adopted_once_the_blocklist_can_be_read(clock):
+    router = UnreadableRouter(blocked={7})
+    reconciler = BlocklistReconciler(router, BLOCK_DURATION)
+    assert reconciler.reconcile() == ([], [])
+    clock[0] += BLOCK_DURATION
+    router.readable = True
+    # the first read that works adopts the block instead of treating it as stale
+    assert reconciler.reconcile() == ([], [])
+    assert reconciler.reconcile(resync=True) == ([], [])
+    assert router.unblock_calls == []
+    clock[0] += BLOCK_DURATION
+    assert reconciler.reconcile() == ([], [7])
+
+
+def test_unblocks_are_retried_when_the_blocklist_does_not_load(clock):
+    router = UnreadableRouter()
+    router.readable = True
+    reconciler = BlocklistReconciler(router, BLOCK_DURATION)
+    reconciler.block([1])
+    reconciler.reconcile()
+    router.readable = False
+    clock[0] += BLOCK_DURATION
+    assert reconciler.reconcile() == ([], [])
+    router.readable = True
+    assert reconciler.reconcile() == ([], [1])
+    assert router.unblock_calls == [[1], [1]]
+    assert router.blocked == set()
@@ -0,0 +1,47 @@
+from code_class import Code
+from code_manager import CodeManager
+from mac_address import MacAddress
+
+
+def test_time_left_is_rounded_up_to_whole_minutes(clock):
+    code = Code("CODE0000001", 30)
+    assert code.expires_at == 1000.0 + 30 * 60
+    assert code.time_left == 30
+    clock[0] += 61
+    assert code.time_left == 29
+    clock[0] += 30 * 60
+    assert code.time_left == 0
+
+
+def test_restored_code_keeps_its_deadline(clock):
+    assert Code("CODE0000001", expires_at=1600.0).time_left == 10
+
+
+def test_codes_expire_at_their_deadline(clock):
+    expired = []
+    manager = CodeManager(expired.extend)
+    manager.bind_user_to_code("CODE0000001", MacAddress(1), 1)
+    manager.bind_user_to_code("CODE0000002", MacAddress(2), 5)
+    clock[0] += 60
+    manager.tick(None)
+    assert expired == ["CODE0000001"]
+    assert manager.get_code_info("CODE0000001") == (0, None)
+    assert manager.get_code_info("CODE0000002") == (1, 4)
+
+
+def test_users_joining_a_code_share_its_deadline(clock):
+    manager = CodeManager(lambda codes: None)
+    manager.bind_user_to_code("CODE0000001", MacAddress(1), 10)
+    clock[0] += 120
+    manager.bind_user_to_code("CODE0000001", MacAddress(2), 10)
+    assert manager.get_code_info("CODE0000001") == (2, 8)
+
+
+def test_deleted_codes_are_not_reported_as_expired(clock):
+    expired = []
+    manager = CodeManager(expired.extend)
+    manager.bind_user_to_code("CODE0000001", MacAddress(1), 1)
+    manager.delete_code("CODE0000001")
+    clock[0] += 60
+    manager.tick(None)
+    assert expired == []
@@ -0,0 +1,77 @@
+from code_manager import CodeManager
+from foreign_tracker import ForeignUserTracker
+from mac_address import MacAddress
+
+GRACE_PERIOD = 300
+A, B, C, D = (MacAddress(value) for value in (1, 2, 3, 4))
+
+
+def test_devices_are_returned_once_their_grace_period_ends(clock):
+    tracker = ForeignUserTracker(GRACE_PERIOD)
+    assert tracker.update({A, B, C}, {C}) == []
+    assert tracker.first_seen == {A: 1000.0, B: 1000.0}
+    clock[0] += 200
+    assert tracker.update({A, B, C, D}, {C}) == []
+    clock[0] += 100
+    assert sorted(tracker.update({A, B, C, D}, {C})) == [A, B]
+
+
+def test_devices_that_leave_are_forgotten(clock):
+    tracker = ForeignUserTracker(GRACE_PERIOD)
+    tracker.update({A, B}, set())
+    clock[0] += 200
+    tracker.update({A}, set())
+    assert tracker.first_seen == {A: 1000.0}
+    # B comes back with a new grace period
+    clock[0] += 100
+    assert tracker.update({A, B}, set()) == [A]
+    assert tracker.first_seen[B] == 1300.0
+
+
+def test_still_connected_devices_get_a_new_grace_period(clock):
+    tracker = ForeignUserTracker(GRACE_PERIOD)
+    tracker.update({A}, set())
+    clock[0] += GRACE_PERIOD
+    assert tracker.update({A}, set()) == [A]
+    assert tracker.first_seen == {A: 1300.0}
+    clock[0] += GRACE_PERIOD
+    assert tracker.update({A}, set()) == [A]
+
+
+def test_discarded_devices_are_not_returned(clock):
+    tracker = ForeignUserTracker(GRACE_PERIOD)
+    tracker.update({A, B}, set())
+    tracker.discard(A)
+    clock[0] += GRACE_PERIOD
+    assert tracker.update({A, B}, {A}) == [B]
+
+
+def test_released_devices_start_a_grace_period(clock):
+    tracker = ForeignUserTracker(GRACE_PERIOD)
+    tracker.update({A, B}, {A})
+    clock[0] += 100
+    tracker.release({A}, set())
+    assert tracker.first_seen == {A: 1100.0, B: 1000.0}
+    # devices that are not connected are not tracked
+    tracker.release({C}, set())
+    assert C not in tracker.first_seen
+
+
+def test_restored_devices_keep_their_deadline(clock):
+    tracker = ForeignUserTracker(GRACE_PERIOD)
+    tracker.restore({A: 800.0, B: 900.0})
+    # B is gone after the restart
+    clock[0] += 100
+    assert tracker.update({A, C}, set()) == [A]
+    assert B not in tracker.first_seen
+    assert tracker.first_seen[C] == 1100.0
+
+
+def test_expired_code_users_become_foreign(clock):
+    manager = CodeManager(lambda codes: None)
+    manager.bind_user_to_code("CODE0000001", A, 1)
+    assert manager.tick({A, B}) == []
+    clock[0] += 61
+    assert manager.tick({A, B}) == []
+    clock[0] += CodeManager.FOREIGN_USER_TIME_LIMIT * 60
+    assert sorted(manager.tick({A, B})) == [A, B]
@@ -0,0 +1,63 @@
+import pytest
+
+from mac_address import MacAddress, parse_mac
+
+
+def test_parse_mac_accepts_the_usual_formats():
+    expected = MacAddress(0x04ED33CEC543)
+    for text in ("04-ED-33-CE-C5-43", "04:ed:33:ce:c5:43", "04ed.33ce.c543", "04ED33CEC543", " 04-ED-33-CE-C5-43 "):
+        assert parse_mac(text) == expected
+
+
+def test_parse_mac_rejects_invalid_text():
+    for text in (None, "", "04-ED-33-CE-C5", "04-ED-33-CE-C5-43-00", "04-ED-33-CE-C5-4G", 1234):
+        assert parse_mac(text) is None
+
+
+def test_parse_mac_returns_mac_addresses_unchanged():
+    mac_address = parse_mac("04-ED-33-CE-C5-43")
+    assert parse_mac(mac_address) is mac_address
+
+
+def test_formats():
+    mac_address = parse_mac("04:ed:33:ce:c5:43")
+    assert mac_address.display == "04-ED-33-CE-C5-43"
+    assert mac_address.compact == "04ED33CEC543"
+    assert str(mac_address) == "04-ED-33-CE-C5-43"
+    assert f"{mac_address}" == "04-ED-33-CE-C5-43"
+    assert repr([mac_address]) == "[04-ED-33-CE-C5-43]"
+
+
+def test_mac_addresses_are_not_strings():
+    # str.join needs the display form, the values themselves are ints
+    macs = [parse_mac("04-ED-33-CE-C5-43"), parse_mac("00-00-00-00-00-01")]
+    with pytest.raises(TypeError):
+        ", ".join(macs)
+    assert ", ".join(mac_address.display for mac_address in macs) == "04-ED-33-CE-C5-43, 00-00-00-00-00-01"
+
+
+def test_set_operations_match_across_formats():
+    connected = {parse_mac("04-ED-33-CE-C5-43"), parse_mac("aa:bb:cc:dd:ee:ff")}
+    allowlist = frozenset({parse_mac("04ED33CEC543")})
+    assert connected - allowlist == {parse_mac("AA-BB-CC-DD-EE-FF")}
+
+
+def test_zero_mac_address_is_truthy():
+    assert parse_mac("00-00-00-00-00-00")
+
+
+def test_out_of_range_values_are_rejected():
+    with pytest.raises(ValueError):
+        MacAddress(1 << 48)
+    with pytest.raises(ValueError):
+        MacAddress(-1)
+
+
+def test_mac_column_round_trip():
+    pytest.importorskip("flask_sqlalchemy")
+    from external.tables import MacColumn
+    column = MacColumn()
+    stored = column.process_bind_param(parse_mac("aa:bb:cc:dd:ee:0f"), None)
+    assert stored == "AA-BB-CC-DD-EE-0F"
+    assert column.process_result_value(stored, None) == parse_mac("AA-BB-CC-DD-EE-0F")
+    assert column.process_result_value(None, None) is None
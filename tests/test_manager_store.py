@@ -0,0 +1,137 @@
+import os
+import time
+
+import pytest
+
+from code_manager import CodeManager
+from mac_address import MacAddress
+from manager_store import ManagerStore, StateCorrupted, SNAPSHOT_FILE
+
+A, B, C = (MacAddress(value) for value in (1, 2, 3))
+
+
+def journal_paths(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.startswith("manager_journal."))
+
+
+def test_snapshot_and_journal_are_replayed(tmp_path):
+    store = ManagerStore(str(tmp_path))
+    store.write_snapshot({"codes": [["CODE0000001", 2000.0, [1]]]}, store.start_snapshot())
+    store.append(["bind", "CODE0000002", 2, 3000.0])
+    store.append(["delete", "CODE0000001"])
+    store.flush()
+
+    saved_at, state, records = ManagerStore(str(tmp_path)).load()
+    assert state == {"codes": [["CODE0000001", 2000.0, [1]]]}
+    assert records == [["bind", "CODE0000002", 2, 3000.0], ["delete", "CODE0000001"]]
+
+
+def test_nothing_saved(tmp_path):
+    assert ManagerStore(str(tmp_path / "state")).load() is None
+
+
+def test_a_snapshot_replaces_only_older_journals(tmp_path):
+    store = ManagerStore(str(tmp_path))
+    store.append(["bind", "CODE0000001", 1, 3000.0])
+    store.flush()
+    generation = store.start_snapshot()
+    # made after the state was captured, so not part of the snapshot
+    store.append(["bind", "CODE0000002", 2, 3000.0])
+    store.write_snapshot({"codes": [["CODE0000001", 3000.0, [1]]]}, generation)
+    _, _, records = ManagerStore(str(tmp_path)).load()
+    assert records == [["bind", "CODE0000002", 2, 3000.0]]
+
+
+def test_an_older_snapshot_does_not_replace_a_newer_one(tmp_path):
+    store = ManagerStore(str(tmp_path))
+    older = store.start_snapshot()
+    newer = store.start_snapshot()
+    store.write_snapshot({"codes": "newer"}, newer)
+    store.write_snapshot({"codes": "older"}, older)
+    assert ManagerStore(str(tmp_path)).load()[1] == {"codes": "newer"}
+
+
+def test_a_torn_last_journal_record_is_ignored(tmp_path):
+    store = ManagerStore(str(tmp_path))
+    store.append(["delete", "CODE0000001"])
+    store.flush()
+    with open(journal_paths(str(tmp_path))[-1], "a") as file:
+        file.write('0badc0de ["bind","CODE0')
+    assert ManagerStore(str(tmp_path)).load()[2] == [["delete", "CODE0000001"]]
+
+
+def test_bad_checksums_are_rejected(tmp_path):
+    store = ManagerStore(str(tmp_path))
+    store.append(["delete", "CODE0000001"])
+    store.append(["delete", "CODE0000002"])
+    store.flush()
+    path = journal_paths(str(tmp_path))[-1]
+    with open(path) as file:
+        text = file.read()
+    with open(path, "w") as file:
+        file.write(text.replace("CODE0000001", "CODE0000009"))
+    with pytest.raises(StateCorrupted):
+        ManagerStore(str(tmp_path)).load()
+
+
+def test_damaged_snapshot_is_rejected(tmp_path):
+    store = ManagerStore(str(tmp_path))
+    store.write_snapshot({"codes": []}, store.start_snapshot())
+    with open(tmp_path / SNAPSHOT_FILE, "a") as file:
+        file.write("x")
+    with pytest.raises(StateCorrupted):
+        ManagerStore(str(tmp_path)).load()
+
+
+def test_clear_removes_the_saved_state(tmp_path):
+    store = ManagerStore(str(tmp_path))
+    store.write_snapshot({"codes": []}, store.start_snapshot())
+    store.append(["delete", "CODE0000001"])
+    store.flush()
+    store.clear()
+    assert ManagerStore(str(tmp_path)).load() is None
+
+
+def test_manager_restores_codes_users_and_foreign_timers(tmp_path):
+    now = time.time()
+    manager = CodeManager(lambda codes: None, store=ManagerStore(str(tmp_path)))
+    manager.bind_user_to_code("CODE0000001", A, 30)
+    manager.bind_user_to_code("CODE0000002", B, 30)
+    manager.tick({A, B, C})
+    manager.save_snapshot()
+    manager.bind_user_to_code("CODE0000003", A, 10)
+    manager.delete_code("CODE0000002")
+
+    restored = CodeManager(lambda codes: None, store=ManagerStore(str(tmp_path)))
+    assert restored.restore()
+    assert restored.get_code_info("CODE0000001") == (0, 30)
+    assert restored.get_code_info("CODE0000002") == (0, None)
+    assert restored.get_code_info("CODE0000003") == (1, 10)
+    first_seen = restored._foreign_users.first_seen
+    assert list(first_seen) == [C]
+    assert now <= first_seen[C] <= time.time()
+
+
+def test_manager_without_saved_state_asks_for_the_database(tmp_path):
+    manager = CodeManager(lambda codes: None, store=ManagerStore(str(tmp_path / "state")))
+    assert not manager.restore()
+
+
+def test_manager_falls_back_when_the_state_is_damaged(tmp_path):
+    manager = CodeManager(lambda codes: None, store=ManagerStore(str(tmp_path)))
+    manager.bind_user_to_code("CODE0000001", A, 30)
+    manager.save_snapshot()
+    with open(tmp_path / SNAPSHOT_FILE, "w") as file:
+        file.write("garbage")
+    restored = CodeManager(lambda codes: None, store=ManagerStore(str(tmp_path)))
+    assert not restored.restore()
+    assert restored.get_code_info("CODE0000001") == (0, None)
+    # the damaged files are cleared so the next snapshot starts clean
+    assert not os.path.exists(tmp_path / SNAPSHOT_FILE)
+
+
+def test_manager_falls_back_when_the_state_is_unreadable(tmp_path):
+    # the snapshot path is a directory, so reading it raises OSError
+    os.makedirs(tmp_path / SNAPSHOT_FILE)
+    manager = CodeManager(lambda codes: None, store=ManagerStore(str(tmp_path)))
+    assert not manager.restore()
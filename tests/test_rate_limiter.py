@@ -0,0 +1,41 @@
+from external.rate_limiter import RateLimiter
+
+
+def test_burst_then_throttle(clock):
+    limiter = RateLimiter(rate=0.2, burst=3)
+    assert [limiter.allow("10.0.0.2") for _ in range(4)] == [True, True, True, False]
+    assert limiter.throttled_count == 1
+
+
+def test_tokens_refill_at_the_rate(clock):
+    limiter = RateLimiter(rate=0.2, burst=2)
+    limiter.allow("10.0.0.2")
+    limiter.allow("10.0.0.2")
+    assert not limiter.allow("10.0.0.2")
+    clock[0] += 5 # one token
+    assert limiter.allow("10.0.0.2")
+    assert not limiter.allow("10.0.0.2")
+
+
+def test_refill_is_capped_at_the_burst(clock):
+    limiter = RateLimiter(rate=1, burst=2)
+    limiter.allow("10.0.0.2")
+    clock[0] += 1000
+    assert [limiter.allow("10.0.0.2") for _ in range(3)] == [True, True, False]
+
+
+def test_keys_have_their_own_buckets(clock):
+    limiter = RateLimiter(rate=0.2, burst=1)
+    assert limiter.allow("10.0.0.2")
+    assert not limiter.allow("10.0.0.2")
+    assert limiter.allow("10.0.0.3")
+
+
+def test_least_recently_used_keys_are_evicted(clock):
+    limiter = RateLimiter(rate=0.2, burst=1, max_keys=2)
+    limiter.allow("a")
+    limiter.allow("b")
+    limiter.allow("c") # evicts a
+    assert list(limiter._buckets) == ["b", "c"]
+    # a starts over with a full bucket
+    assert limiter.allow("a")
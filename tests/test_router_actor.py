@@ -0,0 +1,110 @@
+import threading
+
+from router_actor import RouterActor, PRIORITY_LOOKUP, PRIORITY_ADMIN, PRIORITY_POLL, PRIORITY_BLOCKLIST
+
+
+class FakeRouter:
+    def __init__(self):
+        self.calls = []
+        self.clients = [{"mac": 1, "ip": "10.0.0.2"}]
+
+    def get_connected_clients(self):
+        self.calls.append("clients")
+        return self.clients
+
+
+def record(name):
+    def function(router, *args):
+        router.calls.append((name,) + args)
+        return name
+    return function
+
+
+def test_commands_run_in_priority_order():
+    router = FakeRouter()
+    actor = RouterActor()
+    futures = [
+        actor.submit(PRIORITY_BLOCKLIST, "reconcile", record("reconcile")),
+        actor.submit(PRIORITY_POLL, "poll", record("poll")),
+        actor.submit(PRIORITY_ADMIN, "admin", record("admin")),
+        actor.submit(PRIORITY_LOOKUP, "lookup", record("lookup")),
+    ]
+    # commands submitted before the router is ready wait in the queue
+    actor.start(router)
+    assert [future.result(5) for future in futures] == ["reconcile", "poll", "admin", "lookup"]
+    actor.stop()
+    assert router.calls == [("lookup",), ("admin",), ("poll",), ("reconcile",)]
+
+
+def test_commands_with_the_same_key_share_one_run():
+    router = FakeRouter()
+    actor = RouterActor()
+    first = actor.get_connected_clients()
+    second = actor.get_connected_clients(PRIORITY_LOOKUP)
+    assert first is second
+    actor.start(router)
+    assert first.result(5) == router.clients
+    actor.stop()
+    assert router.calls == ["clients"]
+
+
+def test_a_coalesced_command_moves_up_to_the_higher_priority():
+    router = FakeRouter()
+    actor = RouterActor()
+    actor.submit(PRIORITY_POLL, "poll", record("poll"))
+    actor.get_connected_clients(PRIORITY_POLL)
+    actor.get_connected_clients(PRIORITY_LOOKUP)
+    actor.start(router)
+    actor.stop()
+    assert router.calls == ["clients", ("poll",)]
+
+
+def test_merge_updates_the_waiting_command():
+    router = FakeRouter()
+    actor = RouterActor()
+
+    def merge(args):
+        args[0].add(2)
+    future = actor.submit(PRIORITY_BLOCKLIST, "block", lambda router, batch: sorted(batch), {1})
+    assert actor.submit(PRIORITY_BLOCKLIST, "block", None, merge=merge) is future
+    actor.start(router)
+    assert future.result(5) == [1, 2]
+    actor.stop()
+
+
+def test_errors_are_set_on_the_future():
+    actor = RouterActor()
+    actor.start(FakeRouter())
+
+    def fail(router):
+        raise RuntimeError("router is gone")
+    future = actor.call("fail", fail)
+    try:
+        future.result(5)
+        assert False, "expected the router error"
+    except RuntimeError as e:
+        assert str(e) == "router is gone"
+    # the actor keeps running after a failed command
+    assert actor.call("ok", record("ok")).result(5) == "ok"
+    actor.stop()
+
+
+def test_a_running_command_does_not_absorb_new_submissions():
+    router = FakeRouter()
+    actor = RouterActor()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(router):
+        started.set()
+        release.wait(5)
+        return "first"
+    actor.start(router)
+    first = actor.call("slow", slow)
+    started.wait(5)
+    second = actor.call("slow", record("second"))
+    assert second is not first
+    release.set()
+    assert first.result(5) == "first"
+    assert second.result(5) == "second"
+    actor.stop()
@@ -0,0 +1,51 @@
+import threading
+
+from snapshot_channel import SnapshotChannel
+
+
+def test_take_returns_only_the_newest_snapshot():
+    channel = SnapshotChannel()
+    assert channel.take() is None
+    channel.publish("a")
+    channel.publish("b")
+    channel.publish("c")
+    assert channel.take() == (3, "c")
+    assert channel.take() is None
+    assert channel.stats == {"version": 3, "published": 3, "delivered": 1, "dropped": 2}
+
+
+def test_taken_snapshots_are_not_counted_as_dropped():
+    channel = SnapshotChannel()
+    channel.publish("a")
+    channel.take()
+    channel.publish("b")
+    assert channel.take() == (2, "b")
+    assert channel.dropped == 0
+
+
+def test_wait_returns_a_published_snapshot():
+    channel = SnapshotChannel()
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(channel.wait(timeout=5)))
+    consumer.start()
+    channel.publish("rows")
+    consumer.join(5)
+    assert result == [(1, "rows")]
+
+
+def test_wait_times_out_without_a_new_snapshot():
+    channel = SnapshotChannel()
+    channel.publish("a")
+    channel.take()
+    assert channel.wait(timeout=0.01) is None
+
+
+def test_close_wakes_the_consumer():
+    channel = SnapshotChannel()
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(channel.wait()))
+    consumer.start()
+    channel.close()
+    consumer.join(5)
+    assert not consumer.is_alive()
+    assert result == [None]
@@ -0,0 +1,34 @@
+import pytest
+
+from tick_scheduler import TickScheduler
+
+INTERVAL = 60
+
+
+# Runs the scheduler for one tick per duration, each tick taking that many seconds on the fake clock. Returns the scheduler
+# and the times the ticks started at
+def run_ticks(clock, durations):
+    starts = []
+
+    def on_tick():
+        starts.append(clock[0])
+        clock[0] += durations[len(starts) - 1]
+        if len(starts) == len(durations):
+            scheduler.stop()
+
+    scheduler = TickScheduler(INTERVAL, on_tick)
+    scheduler.run()
+    return scheduler, starts
+
+
+def test_a_slightly_late_tick_runs_right_away(clock):
+    scheduler, starts = run_ticks(clock, [INTERVAL + 0.1, INTERVAL + 0.1, 0])
+    assert starts == pytest.approx([1000.0, 1060.1, 1120.2])
+    assert scheduler.stats["skipped_ticks"] == 0
+
+
+def test_only_ticks_whose_whole_slot_passed_are_skipped(clock):
+    scheduler, starts = run_ticks(clock, [2 * INTERVAL + 10, 0])
+    # the tick due at 1060 was missed entirely, the one due at 1120 starts late
+    assert starts == [1000.0, 1130.0]
+    assert scheduler.stats["skipped_ticks"] == 1
@@ -1,4 +1,6 @@
 # tick_listener interface
 class tick_listener:
+    __slots__ = ()
+
     def update(self):
         pass
@@ -0,0 +1,92 @@
+import math
+import threading
+import time
+import traceback
+
+# Runs a function at a fixed rate on the monotonic clock. Ticks are scheduled from the start time rather than from the end of
+# the previous tick, so slow ticks don't make the period drift. A tick that is late runs as soon as the previous one ends,
+# ticks whose whole slot has passed are skipped and counted
+class TickScheduler:
+
+    def __init__(self, interval, on_tick):
+        self._interval = interval # seconds between tick starts
+        self._on_tick = on_tick
+        self._stopped = threading.Event()
+        self._rescheduled = threading.Event() # wakes the loop when the interval changes
+        self._lock = threading.Lock()
+        self._next_tick = None # monotonic time of the next tick
+
+        # metrics of the tick loop
+        self._tick_count = 0
+        self._skipped_ticks = 0
+        self._last_start = None # wall-clock time the last tick started
+        self._last_duration = None # seconds the last tick took
+        self._last_lateness = None # seconds the last tick started after its scheduled time
+        self._max_duration = 0.0
+
+    # Runs ticks until stop is called. The first tick runs immediately
+    def run(self):
+        with self._lock:
+            self._next_tick = time.monotonic()
+        while not self._stopped.is_set():
+            with self._lock:
+                delay = self._next_tick - time.monotonic()
+            if delay > 0:
+                self._rescheduled.wait(delay)
+                self._rescheduled.clear()
+                continue
+
+            started = time.monotonic()
+            with self._lock:
+                scheduled = self._next_tick
+                self._last_start = time.time()
+                self._last_lateness = started - scheduled
+            try:
+                self._on_tick()
+            except Exception as e:
+                print(f"Error in tick: {e}")
+                traceback.print_exc()
+            finished = time.monotonic()
+
+            with self._lock:
+                self._tick_count += 1
+                self._last_duration = finished - started
+                self._max_duration = max(self._max_duration, self._last_duration)
+                self._next_tick = scheduled + self._interval
+                # a late tick runs right away, only the ticks whose whole slot passed while this one was running are skipped
+                skipped = math.floor((finished - self._next_tick) / self._interval)
+                if skipped > 0:
+                    self._skipped_ticks += skipped
+                    self._next_tick += skipped * self._interval
+                    print(f"Tick overran by {finished - scheduled - self._interval:.1f}s, skipped {skipped} tick(s).")
+
+    # Stops the loop after the current tick
+    def stop(self):
+        self._stopped.set()
+        self._rescheduled.set()
+
+    # Changes the tick interval. The next tick is moved to one new interval after the last scheduled tick
+    def set_interval(self, interval):
+        with self._lock:
+            if self._next_tick is not None:
+                self._next_tick += interval - self._interval
+            self._interval = interval
+        self._rescheduled.set()
+
+    @property
+    def interval(self):
+        return self._interval
+
+    # Returns the metrics of the tick loop
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                "interval": self._interval,
+                "tick_count": self._tick_count,
+                "skipped_ticks": self._skipped_ticks,
+                "last_start": self._last_start,
+                "last_duration": self._last_duration,
+                "last_lateness": self._last_lateness,
+                "max_duration": self._max_duration,
+            }
@@ -0,0 +1,23 @@
+import csv
+import html
+
+VOUCHER_COLUMNS = 4 # vouchers per row on the printable sheet
+
+# Writes the vouchers to a file as CSV one row at a time
+def write_vouchers_csv(codes, duration, file):
+    writer = csv.writer(file)
+    writer.writerow(["code", "duration_minutes"])
+    for code in codes:
+        writer.writerow([code, duration])
+
+# Writes the vouchers to a file as a printable HTML sheet one voucher at a time
+def write_vouchers_sheet(codes, duration, file, title="Wifi Voucher"):
+    file.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Vouchers</title><style>\n")
+    file.write(f".sheet {{display: grid; grid-template-columns: repeat({VOUCHER_COLUMNS}, 1fr); gap: 8px; font-family: sans-serif;}}\n")
+    file.write(".voucher {border: 1px dashed #555; padding: 10px; text-align: center; break-inside: avoid;}\n")
+    file.write(".code {font-size: 18px; font-weight: bold; letter-spacing: 2px; font-family: monospace;}\n")
+    file.write("</style></head><body><div class=\"sheet\">\n")
+    escaped_title = html.escape(title)
+    for code in codes:
+        file.write(f"<div class=\"voucher\"><div>{escaped_title}</div><div class=\"code\">{html.escape(code)}</div><div>{duration} minutes</div></div>\n")
+    file.write("</div></body></html>\n")
@@ -0,0 +1,337 @@
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from external.webserver import WebServer
+from router_backend import create_router, ADMIN_ALLOWLIST
+from client_index import ClientIndex
+from blocklist_reconciler import BlocklistReconciler
+from tick_scheduler import TickScheduler
+from router_actor import RouterActor, PRIORITY_LOOKUP, PRIORITY_BLOCKLIST
+from snapshot_channel import SnapshotChannel
+from code_manager import CodeManager
+from manager_store import ManagerStore
+from startup import StartupPhases
+from voucher_export import write_vouchers_csv, write_vouchers_sheet
+
+NUM_WORKERS = 2  # number of workers to use for the thread pool
+BLOCKLIST_RESYNC_SCHEDULE = 15 # re-read the router's blocklist every 15 minutes
+TICK_INTERVAL = 60  # 1 minute
+MIN_CODE_DURATION = 5
+MAX_CODE_DURATION = 60
+VOUCHER_DIR = "vouchers" # folder the exported voucher batches are written to
+MAX_VOUCHER_BATCH = 10000
+ROUTER_BACKEND = "selenium"  # "selenium" drives the router page in Chrome, "http" talks to the router's JSON endpoints directly
+
+# Keeps the duration of a code within the allowed range
+def clamp_duration(duration):
+    return int(max(MIN_CODE_DURATION, min(MAX_CODE_DURATION, float(duration))))
+
+# The wifi manager without any UI: code manager, router, captive portal and tick loop. The Tk window and the admin API are
+# clients of this class
+class WifiService:
+
+    def __init__(self, router_backend=ROUTER_BACKEND):
+        self.code_channel = SnapshotChannel() # newest code list for the UIs
+        self.task_queue = Queue()
+        self.manager_lock = threading.RLock()
+        self.running = True
+        self.minute_counter = 0
+        self.router_password = None # today's guest network password
+        self.router_backend = router_backend
+        self.startup = StartupPhases()
+
+        self.manager_store = ManagerStore()
+        self.manager = CodeManager(self.on_code_expired, store=self.manager_store)
+        self.router = None # created by the router phase, launching the browser takes a while
+        self.blocklist = None
+        self.client_index = ClientIndex(self.fetch_clients)
+        self.router_actor = RouterActor() # every router operation goes through the actor's queue
+
+        self.webserver = WebServer(on_success_callback=self.task_queue.put)
+        self.tick_scheduler = TickScheduler(TICK_INTERVAL, self.scheduled_tick)
+        self.webserver_thread = None
+        self.tick_thread = None
+        self.user_binding_thread = None
+
+    # Starts every startup phase and returns without waiting for them. The router and the database are prepared at the same
+    # time and each phase starts as soon as the phases it needs are ready. Router commands submitted before the router is
+    # logged in wait in the actor's queue
+    def start(self):
+        self.startup.start("router", self.start_router)
+        self.startup.start("database", self.webserver.prepare_database)
+        self.startup.start("portal", self.start_portal, needs=("database",))
+        # on a new day the guest password is changed before codes can be redeemed, so yesterday's codes are not accepted.
+        # The portal holds the codes sent until then
+        self.startup.start("environment", self.prepare_day, needs=("database",))
+        self.startup.start("binding", self.start_binding_queue, needs=("environment",))
+        self.startup.start("tick", self.start_ticks, needs=("environment", "router"))
+
+    # Waits until every startup phase is ready. Returns False if the timeout passed first
+    def wait_until_ready(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for phase in ("router", "database", "environment", "portal", "binding", "tick"):
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not self.startup.wait(phase, remaining):
+                return False
+        print(f"Startup done: {self.startup.stats}")
+        return True
+
+    def stop(self):
+        self.running = False
+        self.tick_scheduler.stop()
+        self.task_queue.put((None, None, None))
+        self.code_channel.close()
+        if self.tick_thread is not None:
+            self.tick_thread.join()
+        if self.startup.is_ready("router"):
+            self.router_actor.stop()
+        if self.user_binding_thread is not None:
+            self.user_binding_thread.join()
+        # a clean stop restores from an up to date snapshot with an empty journal
+        if self.startup.is_ready("environment"):
+            self.manager.save_snapshot()
+        self.manager_store.close()
+
+    ### Startup phases ###
+
+    # Launches the browser and logs in. The actor is started even if this fails so queued commands fail instead of waiting
+    def start_router(self):
+        try:
+            router = create_router(self.router_backend)
+            router.login()
+            self.blocklist = BlocklistReconciler(router)
+            self.router = router
+        finally:
+            self.router_actor.start(self.router)
+
+    # Starts the captive portal and returns once it is accepting connections. Submissions are queued for binding from then on
+    def start_portal(self):
+        # waitress has no clean shutdown, so the portal thread doesn't keep the process alive
+        self.webserver_thread = threading.Thread(target=self.webserver.run, daemon=True)
+        self.webserver_thread.start()
+        while not self.webserver.listening.wait(1):
+            if not self.webserver_thread.is_alive():
+                raise RuntimeError("Captive portal stopped before it was listening.")
+
+    # Prepares the day, then lets the portal redeem codes, starting with the ones it held. Redemptions open even if the day
+    # could not be prepared so the portal keeps working. After a failed new-day rollover the router keeps its old password
+    # and the database keeps yesterday's codes, so they stay valid until a later start rolls the day over
+    def prepare_day(self):
+        if not self.setup_environment():
+            print("The day could not be prepared, opening redemptions with the current codes.")
+        self.webserver.open_redemptions()
+
+    def start_binding_queue(self):
+        self.user_binding_thread = threading.Thread(target=self.user_binding_queue)
+        self.user_binding_thread.start()
+
+    def start_ticks(self):
+        self.tick_thread = threading.Thread(target=self.tick_scheduler.run)
+        self.tick_thread.start()
+
+    ### Admin operations ###
+
+    # Creates a single code. Returns the code or None if it could not be added
+    def generate_code(self, duration):
+        duration = clamp_duration(duration)
+        with self.manager_lock:
+            code = self.manager.generate_code_string()
+            success = self.webserver.add_code(code, duration)
+        if not success:
+            return None
+        self.update_code_list()
+        return code
+
+    # Creates a batch of codes with one bulk insert and exports them as CSV and a printable sheet. Returns the exported file paths
+    def generate_vouchers(self, count, duration):
+        count = max(1, min(MAX_VOUCHER_BATCH, int(count)))
+        duration = clamp_duration(duration)
+        codes = []
+        with self.manager_lock:
+            # regenerate only the codes that collided with existing ones
+            while len(codes) < count:
+                added = self.webserver.add_codes(self.manager.generate_code_strings(count - len(codes)), duration)
+                if not added:
+                    raise RuntimeError("Could not add vouchers to the database.")
+                codes.extend(added)
+
+        os.makedirs(VOUCHER_DIR, exist_ok=True)
+        batch_name = os.path.join(VOUCHER_DIR, f"vouchers_{time.strftime('%Y%m%d_%H%M%S')}_{count}x{duration}min")
+        with open(f"{batch_name}.csv", "w", newline="") as file:
+            write_vouchers_csv(codes, duration, file)
+        with open(f"{batch_name}.html", "w") as file:
+            write_vouchers_sheet(codes, duration, file)
+        print(f"Generated {len(codes)} vouchers in {batch_name}.csv and {batch_name}.html")
+        self.update_code_list()
+        return (f"{batch_name}.csv", f"{batch_name}.html")
+
+    def delete_code(self, code):
+        with self.manager_lock:
+            self.manager.delete_code(code)
+            self.webserver.delete_code(code)
+        self.update_code_list()
+
+    # Temporarily unblocks every blocked device. Returns True if the router's blocklist is empty afterwards
+    def unblock_all(self):
+        self.startup.wait("router")
+        if self.blocklist is None:
+            raise RuntimeError("Router is not available.")
+        self.blocklist.release_all()
+        return bool(self.router_actor.call("unblock_all", lambda router: router.unblock_all_devices()).result())
+
+    def reset_database(self):
+        self.webserver.reset_database()
+        self.update_code_list()
+
+    # Returns every code as (code, status, users, time remaining)
+    def get_code_rows(self, codes=None):
+        if codes is None:
+            codes = self.webserver.get_all_codes()
+        rows = []
+        for key, status, init_duration in codes:
+            users, time_remaining = self.manager.get_code_info(key)
+            if time_remaining is None:
+                time_remaining = init_duration
+            rows.append((key, status, users, time_remaining))
+        return rows
+
+    # Returns the state of the service and the metrics of its parts
+    def get_status(self):
+        return {
+            "router_password": self.router_password,
+            "startup": self.startup.stats,
+            "tick": self.tick_scheduler.stats,
+            "database_pool": self.webserver.get_pool_stats(),
+            "submit_throttled": self.webserver.rate_limiter.throttled_count,
+            "code_channel": self.code_channel.stats,
+            "router": self.router.get_stats() if self.router is not None else None,
+        }
+
+    ### Internals ###
+
+    def update_code_list(self):
+        try:
+            codes = self.webserver.get_all_codes()
+            self.code_channel.publish(codes)
+        except Exception as e:
+            print(f"Error in update_code_list: {e}")
+            traceback.print_exc()
+
+    # Changes the guest password and clears the blocklist for the new day. Runs on the router actor
+    def rollover_router(self, router, new_password):
+        password_change_success = router.change_router_password(new_password)
+        if password_change_success:
+            self.blocklist.release_all()
+            if not router.unblock_all_devices():
+                print("The blocklist could not be cleared for the new day, its entries are removed at the next resync.")
+        return password_change_success
+
+    # Changes the password and clears the codes on a new day, or restores the codes in use on the same day. Returns False
+    # if the new day could not be rolled over or setting up failed
+    def setup_environment(self):
+        with self.manager_lock:
+            try:
+                print("Setting up environment...")
+                new_router_password = self.manager.generate_code_string()
+                newday = self.webserver.is_new_day()
+                old_router_password = self.webserver.get_router_password()
+                self.router_password = old_router_password
+                prepared = True
+                if newday:
+                    password_change_success = self.router_actor.call("rollover", lambda router: self.rollover_router(router, new_router_password)).result()
+                    prepared = password_change_success
+                    if password_change_success:
+                        self.webserver.reset_database()
+                        self.manager.clear_saved_state()
+                        self.webserver.change_router_password(new_router_password)
+                        self.router_password = new_router_password
+                    else:
+                        print(f"Password change failed. Using old password {old_router_password}.")
+                    print("New day!")
+                else:
+                    print(f"Same day! Using old password {old_router_password}.")
+                    # drop codes that expired while the app was not running, then restore the devices using the remaining ones.
+                    # The saved snapshot and journal also keep the foreign user timers, the database is only read without them
+                    self.webserver.purge_expired_codes()
+                    if not self.manager.restore():
+                        for mac, code, minutes_left in self.webserver.get_active_registrations():
+                            self.manager.bind_user_to_code(code, mac, minutes_left)
+                        self.manager.save_snapshot()
+                self.update_code_list()
+                print("Setup done")
+                return prepared
+            except Exception as e:
+                print(f"Error in setup_environment: {e}")
+                traceback.print_exc()
+                return False
+
+
+    # Reads the client list for the client index when a lookup misses, ahead of any queued poll or block
+    def fetch_clients(self):
+        return self.router_actor.get_connected_clients(PRIORITY_LOOKUP).result()
+
+    # Polls the router for connected clients and refreshes the client index. Returns the set of non-admin mac addresses
+    def poll_connected_devices(self):
+        try:
+            clients = self.router_actor.get_connected_clients().result()
+        except Exception as e:
+            print(f"Could not find any connected devices. Error: {e}")
+            return None
+        self.client_index.update(clients)
+        print(f"Devices connected: {len(clients)}")
+        return {client["mac"] for client in clients} - ADMIN_ALLOWLIST
+
+    def on_submit_success(self, ip, code, duration):
+        mac = self.client_index.lookup(ip)
+        print(f"Form submitted successfully! IP: {ip}, MAC: {mac} Code: {code}")
+        if mac:
+            with self.manager_lock:
+                self.manager.bind_user_to_code(code, mac, duration)
+                self.webserver.update_registration(ip, mac) # update registration in database
+
+
+    def on_code_expired(self,codes):
+        if codes:
+            self.webserver.delete_expired_codes(codes)
+
+
+    def scheduled_tick(self):
+        try:
+            print(f"############################Tick: {self.minute_counter}")
+            # stage one: snapshot the connected clients through the router actor
+            foreign_users = self.poll_connected_devices()
+
+            # stage two: decide what to expire and block, only the manager is held
+            with self.manager_lock:
+                to_block = self.manager.tick(foreign_users)
+            if to_block:
+                self.blocklist.block(to_block)
+
+            # stage three: apply the blocks in the background. A reconcile still waiting in the queue is reused
+            self.router_actor.reconcile(self.blocklist, resync=self.minute_counter % BLOCKLIST_RESYNC_SCHEDULE == 0)
+            self.router_actor.call("keep_alive", lambda router: router.keep_alive(), PRIORITY_BLOCKLIST)
+            self.minute_counter += 1
+            self.update_code_list()
+        except Exception as e:
+            print(f"Error in scheduled_tick: {e}")
+            traceback.print_exc()
+        print(f"Tick stats: {self.tick_scheduler.stats}")
+
+
+    def user_binding_queue(self):
+        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+            while True:
+                try:
+                    ip, code, duration = self.task_queue.get()
+                    print("-----------------------------------------------Got task from queue")
+                    if ip is None:
+                        print("Got None task, exiting")
+                        break
+                    executor.submit(self.on_submit_success, ip, code, duration)
+                    self.task_queue.task_done()  # Mark the task as done
+                except Exception as e:
+                    print(f"Error in user_binding_queue: {e}")
+                    traceback.print_exc()